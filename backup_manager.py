@@ -0,0 +1,386 @@
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import zlib
+
+from text_utils import register_sql_functions
+from utils import log_error
+
+# Koliko stranica baze se kopira u jednom koraku i koliko se čeka između koraka
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.005
+
+BACKUP_PREFIX = "database_"
+ARCHIVE_BACKUP_PREFIX = "archive_"
+BACKUP_SUFFIXES = (".db.gz", ".bak")  # .bak su stare nekompresovane kopije
+
+# Inkrementalni snimci: baza se deli na delove fiksne veličine (poravnate sa stranicama), audio na veće delove
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_PREFIX = "snapshot_"
+DB_CHUNK_SIZE = 256 * 1024
+AUDIO_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupJob:
+    """State of one backup started by BackupManager.start_backup()."""
+
+    def __init__(self, path, source_path, prefix=BACKUP_PREFIX):
+        self.path = path
+        self.source_path = source_path
+        self.prefix = prefix
+        self.snapshot_ready = threading.Event()
+        self.done = threading.Event()
+        self.ok = False
+        self.error = None
+
+    def wait(self, timeout=None):
+        """Blocks until the backup is written and verified. Returns True on success."""
+        self.done.wait(timeout)
+        return self.ok
+
+
+class BackupManager:
+    """
+    Online backups through sqlite3.Connection.backup.
+
+    Every backup runs on its own thread with its own connection. In WAL mode the thread first pins a
+    read snapshot, so start_backup() returns as soon as the backup's content is fixed, and writes made
+    afterwards (e.g. the delete the backup protects) do not end up in it. Pages are then copied in small
+    steps with a pause between them, the copy is checked with PRAGMA quick_check and stored gzip-compressed.
+    Only the newest `keep` backups are kept.
+
+    mode="snapshot" stores the verified copy in a SnapshotStore instead of a .db.gz file, so only chunks
+    that changed since earlier snapshots are written. With audio_dir set, audio files are added the same way.
+    """
+
+    def __init__(self, db_path, backup_dir, keep=5, pages_per_step=BACKUP_PAGES_PER_STEP,
+                 step_pause=BACKUP_STEP_PAUSE, mode="full", audio_dir=None):
+        if mode not in ("full", "snapshot"):
+            raise ValueError(f"Unsupported backup mode: {mode}")
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.mode = mode
+        self.audio_dir = audio_dir  # samo za "snapshot"; None = audio se ne čuva
+        self.snapshots = SnapshotStore(os.path.join(backup_dir, SNAPSHOT_DIR))
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self._copy_lock = threading.Lock()  # kopira se jedna po jedna rezerva
+        self._jobs = []
+        self._jobs_lock = threading.Lock()
+        os.makedirs(backup_dir, exist_ok=True)
+        if mode == "snapshot":
+            os.makedirs(self.snapshots.root, exist_ok=True)
+
+    def start_backup(self, progress_callback=None, snapshot_timeout=10.0, source_path=None, prefix=BACKUP_PREFIX):
+        """
+        Starts a backup in the background and returns its BackupJob once the snapshot is pinned.
+        progress_callback(remaining_pages, total_pages) is called from the backup thread.
+        source_path backs up another database file (e.g. the archive) as a full .db.gz copy named `prefix`*.
+        """
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        if self.mode == "snapshot" and source_path is None:
+            job = BackupJob(self.snapshots.manifest_path(timestamp), self.db_path)
+        else:
+            job = BackupJob(
+                os.path.join(self.backup_dir, f"{prefix}{timestamp}.db.gz"), source_path or self.db_path, prefix
+            )
+        thread = threading.Thread(
+            target=self._run, args=(job, progress_callback), name="db-backup", daemon=True
+        )
+        with self._jobs_lock:
+            self._jobs = [j for j in self._jobs if not j.done.is_set()]
+            self._jobs.append(job)
+        thread.start()
+        job.snapshot_ready.wait(snapshot_timeout)
+        return job
+
+    def wait_all(self, timeout=None):
+        """Waits for every running backup, e.g. before the application exits."""
+        with self._jobs_lock:
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.done.wait(timeout)
+
+    def list_backups(self, prefix=BACKUP_PREFIX):
+        """Backup file names, newest first."""
+        return sorted(
+            (name for name in os.listdir(self.backup_dir)
+             if name.startswith(prefix) and name.endswith(BACKUP_SUFFIXES)),
+            reverse=True
+        )
+
+    def _run(self, job, progress_callback):
+        temp_path = os.path.splitext(job.path)[0] + ".tmp"
+        source = None
+        try:
+            source = sqlite3.connect(job.source_path, isolation_level=None)
+            register_sql_functions(source)
+            source.execute("PRAGMA busy_timeout = 5000")
+            wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            if wal:
+                # Otvorena transakcija čitanja zamrzava sadržaj rezerve; upisi drugih konekcija ga ne menjaju
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            job.snapshot_ready.set()
+
+            with self._copy_lock:
+                target = sqlite3.connect(temp_path)
+                register_sql_functions(target)
+                try:
+                    source.backup(
+                        target, pages=self.pages_per_step, progress=self._progress(progress_callback),
+                        sleep=self.step_pause
+                    )
+                    result = target.execute("PRAGMA quick_check").fetchone()[0]
+                finally:
+                    target.close()
+                if wal:
+                    source.execute("COMMIT")
+                if result != "ok":
+                    raise sqlite3.DatabaseError(f"quick_check failed: {result}")
+
+                if job.path.endswith(".json"):
+                    self.snapshots.write(job.path, temp_path, self.audio_dir)
+                    self.snapshots.prune(self.keep)
+                else:
+                    with open(temp_path, "rb") as src_file, gzip.open(job.path + ".part", "wb", compresslevel=6) as gz:
+                        shutil.copyfileobj(src_file, gz, 1024 * 1024)
+                    os.replace(job.path + ".part", job.path)
+                    self._apply_retention(job.prefix)
+                job.ok = True
+        except (sqlite3.Error, OSError, ValueError) as e:
+            job.error = e
+            log_error(f"Database backup failed: {e}")
+        finally:
+            job.snapshot_ready.set()
+            if source is not None:
+                source.close()
+            for leftover in (temp_path, job.path + ".part"):
+                if os.path.exists(leftover):
+                    try:
+                        os.remove(leftover)
+                    except OSError:
+                        pass
+            job.done.set()
+
+    @staticmethod
+    def _progress(progress_callback):
+        if progress_callback is None:
+            return None
+        return lambda status, remaining, total: progress_callback(remaining, total)
+
+    def _apply_retention(self, prefix):
+        # Keep last N backups
+        for old_backup in self.list_backups(prefix)[self.keep:]:
+            try:
+                os.remove(os.path.join(self.backup_dir, old_backup))
+            except OSError as e:
+                log_error(f"Removing old backup {old_backup} failed: {e}")
+
+
+class SnapshotStore:
+    """
+    Deduplicated backup snapshots.
+
+    Files are split into fixed-size chunks that are stored once, zlib-compressed, under chunks/<sha256>.
+    A snapshot is a JSON manifest listing the chunk hashes of the database and, optionally, of every
+    audio file. A new snapshot writes only the chunks that no earlier snapshot has. Audio files whose
+    size and modification time match the previous snapshot are not even read again.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.chunk_dir = os.path.join(root, "chunks")
+
+    def manifest_path(self, timestamp):
+        return os.path.join(self.root, f"{SNAPSHOT_PREFIX}{timestamp}.json")
+
+    def list_snapshots(self):
+        """Manifest file names, newest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            (name for name in os.listdir(self.root) if name.startswith(SNAPSHOT_PREFIX) and name.endswith(".json")),
+            reverse=True
+        )
+
+    def load_manifest(self, snapshot):
+        path = snapshot if os.path.isabs(snapshot) or os.path.exists(snapshot) else os.path.join(self.root, snapshot)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write(self, manifest_path, db_copy_path, audio_dir=None):
+        """Stores a verified database copy (and audio_dir) and writes the manifest. Returns the manifest."""
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        previous = self._latest_manifest()
+        manifest = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "database": self._store_file(db_copy_path, DB_CHUNK_SIZE),
+            "audio": None,
+        }
+        if audio_dir is not None:
+            previous_audio = (previous or {}).get("audio") or {}
+            manifest["audio"] = self._store_audio(audio_dir, previous_audio)
+        part_path = manifest_path + ".part"
+        with open(part_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(part_path, manifest_path)
+        return manifest
+
+    def restore(self, snapshot, target_db_path, audio_dir=None):
+        """
+        Rebuilds the database of `snapshot` at target_db_path and, when audio_dir is given, its audio files.
+        The database is checked with quick_check before it replaces target_db_path.
+        """
+        manifest = self.load_manifest(snapshot)
+        part_path = target_db_path + ".part"
+        try:
+            self._restore_file(manifest["database"], part_path)
+            conn = sqlite3.connect(part_path)
+            register_sql_functions(conn)
+            try:
+                result = conn.execute("PRAGMA quick_check").fetchone()[0]
+            finally:
+                conn.close()
+            if result != "ok":
+                raise sqlite3.DatabaseError(f"quick_check failed: {result}")
+            # Stari -wal/-shm fajlovi pripadaju bazi koja se zamenjuje
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(target_db_path + suffix):
+                    os.remove(target_db_path + suffix)
+            os.replace(part_path, target_db_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        if audio_dir is not None and manifest.get("audio"):
+            for relative_path, entry in manifest["audio"].items():
+                path = os.path.join(audio_dir, *relative_path.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._restore_file(entry, path + ".part")
+                os.replace(path + ".part", path)
+        return manifest
+
+    def prune(self, keep):
+        """Keeps the newest `keep` snapshots and deletes chunks that no remaining snapshot uses."""
+        snapshots = self.list_snapshots()
+        for name in snapshots[keep:]:
+            os.remove(os.path.join(self.root, name))
+        used = set()
+        for name in snapshots[:keep]:
+            manifest = self.load_manifest(name)
+            used.update(manifest["database"]["chunks"])
+            for entry in (manifest.get("audio") or {}).values():
+                used.update(entry["chunks"])
+        if not os.path.isdir(self.chunk_dir):
+            return
+        for prefix in os.listdir(self.chunk_dir):
+            prefix_dir = os.path.join(self.chunk_dir, prefix)
+            for chunk in os.listdir(prefix_dir):
+                if chunk not in used:
+                    os.remove(os.path.join(prefix_dir, chunk))
+
+    def _latest_manifest(self):
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return None
+        try:
+            return self.load_manifest(snapshots[0])
+        except (OSError, ValueError) as e:
+            log_error(f"Reading snapshot {snapshots[0]} failed: {e}")
+            return None
+
+    def _store_audio(self, audio_dir, previous_audio):
+        entries = {}
+        for dirpath, _, filenames in os.walk(audio_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                relative_path = os.path.relpath(path, audio_dir).replace(os.sep, "/")
+                stat = os.stat(path)
+                old = previous_audio.get(relative_path)
+                # Nepromenjen fajl: preuzmi delove iz prethodnog snimka bez čitanja
+                if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns \
+                        and all(self._has_chunk(h) for h in old["chunks"]):
+                    entries[relative_path] = old
+                    continue
+                entry = self._store_file(path, AUDIO_CHUNK_SIZE)
+                entry["mtime_ns"] = stat.st_mtime_ns
+                entries[relative_path] = entry
+        return entries
+
+    def _store_file(self, path, chunk_size):
+        chunks = []
+        size = 0
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                size += len(data)
+                digest = hashlib.sha256(data).hexdigest()
+                if not self._has_chunk(digest):
+                    chunk_path = self._chunk_path(digest)
+                    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                    with open(chunk_path + ".part", "wb") as out:
+                        out.write(zlib.compress(data, 6))
+                    os.replace(chunk_path + ".part", chunk_path)
+                chunks.append(digest)
+        return {"size": size, "chunk_size": chunk_size, "chunks": chunks}
+
+    def _restore_file(self, entry, path):
+        with open(path, "wb") as out:
+            for digest in entry["chunks"]:
+                with open(self._chunk_path(digest), "rb") as f:
+                    data = zlib.decompress(f.read())
+                if hashlib.sha256(data).hexdigest() != digest:
+                    raise ValueError(f"Snapshot chunk {digest} is corrupted")
+                out.write(data)
+            if out.tell() != entry["size"]:
+                raise ValueError(f"Restored size {out.tell()} does not match snapshot size {entry['size']}")
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def _has_chunk(self, digest):
+        return os.path.exists(self._chunk_path(digest))
+
+
+def main():
+    default_backup_dir = os.path.join(os.path.expandvars(r"%APPDATA%\DoctorApp"), "data", "backup")
+    parser = argparse.ArgumentParser(description="Lists and restores database backup snapshots.")
+    parser.add_argument("--backup-dir", default=default_backup_dir)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list snapshots, newest first")
+    restore_parser = commands.add_parser(
+        "restore", help="rebuild a snapshot; close the application first when restoring over its database"
+    )
+    restore_parser.add_argument("snapshot", help="manifest name from 'list', or 'latest'")
+    restore_parser.add_argument("target_db")
+    restore_parser.add_argument("--audio-dir", help="also restore the snapshot's audio files into this directory")
+    args = parser.parse_args()
+
+    store = SnapshotStore(os.path.join(args.backup_dir, SNAPSHOT_DIR))
+    if args.command == "list":
+        for name in store.list_snapshots():
+            manifest = store.load_manifest(name)
+            audio_files = len(manifest.get("audio") or {})
+            print(f"{name}  {manifest['database']['size'] / 1e6:.1f} MB  audio files: {audio_files}")
+        return
+    snapshot = args.snapshot
+    if snapshot == "latest":
+        snapshots = store.list_snapshots()
+        if not snapshots:
+            parser.error("no snapshots found")
+        snapshot = snapshots[0]
+    store.restore(snapshot, args.target_db, args.audio_dir)
+    print(f"Restored {snapshot} to {args.target_db}")
+
+
+if __name__ == "__main__":
+    main()
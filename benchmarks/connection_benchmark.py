@@ -0,0 +1,66 @@
+"""
+Compares per-call latency of DatabaseManager reads against the old pattern
+of opening a new sqlite3 connection for every call.
+
+Usage: python benchmarks/connection_benchmark.py [--patients N] [--calls N]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+from text_utils import register_sql_functions
+
+
+def seed(db_manager, patients):
+    for i in range(patients):
+        patient_id = db_manager.add_patient(f"Ime{i}", f"Prezime{i}", "1980-01-01", phone_number="0601234567")
+        db_manager.add_appointment(patient_id, "2024-01-01", diagnose_text="Kontrola")
+
+
+def per_call_connect(db_path, patient_id):
+    # Stari obrazac: nova konekcija za svaki poziv
+    with sqlite3.connect(db_path) as conn:
+        # Generisane kolone (full_name, search_key, ...) se računaju funkcijama koje mora da ima svaka konekcija
+        register_sql_functions(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM patient WHERE id = ?", (patient_id,))
+        row = cursor.fetchone()
+    conn.close()
+    return row
+
+
+def measure(label, func, calls, patients):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i % patients + 1)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / calls * 1e6:10.1f} us/call")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "database.db")
+        db_manager = DatabaseManager(db_path)
+        seed(db_manager, args.patients)
+
+        before = measure("connect() per call", lambda pid: per_call_connect(db_path, pid), args.calls, args.patients)
+        after = measure("persistent connection", db_manager.get_patient, args.calls, args.patients)
+        print(f"{'speedup':<28} {before / after:10.1f}x")
+
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
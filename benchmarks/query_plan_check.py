@@ -0,0 +1,254 @@
+"""
+Checks the query plans of every DatabaseManager query against a large seeded database.
+
+Each public DatabaseManager method that runs SQL is called once while SQLite's trace callback records
+the statements it executes. Every statement is then run through EXPLAIN QUERY PLAN. The check fails when
+a statement scans patient or appointment (main or archive) without an index, or walks a whole index
+without a LIMIT, unless the method is listed in FULL_SCAN_ALLOWED. It also fails when a call executes
+more virtual machine steps than STEP_BUDGET (see STEP_BUDGET_EXEMPT), or when a public method is neither
+called nor listed in NO_SQL.
+
+Usage: python benchmarks/query_plan_check.py [--patients N] [--visits-per-patient N] [--verbose]
+Exits with status 1 when a check fails.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager, APPOINTMENT_ALL_VIEW_SQL
+
+# Tabele koje ne smeju da se čitaju celom dužinom
+CHECKED_TABLES = {"patient", "appointment"}
+
+# Metode koje po definiciji čitaju sve redove
+FULL_SCAN_ALLOWED = {
+    "get_all_patients": "returns every patient",
+    "get_all_appointments": "returns every appointment",
+    "iter_export": "exports the whole database",
+    "load_name_index": "reads every patient name into the in-memory trigram index",
+}
+
+# Metode čija cena raste sa brojem redova koje upisuju, premeštaju ili rangiraju; planovi se i za njih proveravaju
+STEP_BUDGET_EXEMPT = {
+    "archive_appointments": "moves every appointment older than the cutoff",
+    "search_patients": "ranks every full-text match with bm25",
+}
+
+# Javne metode koje ne izvršavaju sopstvene upite nad podacima
+NO_SQL = {
+    "connection", "release_connection", "close", "init_db", "has_pending_schema_tasks", "run_schema_tasks", "start_schema_tasks",
+    "start_audio_janitor", "start_archiving", "backup_db", "invalidate_patient", "patient_cache_stats",
+    "name_index_stats", "patient_matches_query", "parse_patient_query", "is_structured_query",
+}
+
+# Najveći dozvoljeni broj VM koraka po pozivu, osim za FULL_SCAN_ALLOWED i STEP_BUDGET_EXEMPT;
+# pun prolaz kroz patient pri podrazumevanoj veličini baze je nekoliko miliona koraka
+STEP_BUDGET = 500_000
+STEP_GRANULARITY = 1000
+
+SCAN_RE = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?$")
+VIEW_REF_RE = re.compile(r"\bappointment_all(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+TABLE_REF_RE = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SQL_KEYWORDS = {"where", "on", "join", "left", "inner", "order", "group", "limit", "using", "set", "values",
+                "select", "union", "natural", "cross", "default", "as", "indexed", "not"}
+
+FIRST_NAMES = ["Petar", "Marko", "Jovana", "Milica", "Nikola", "Ana", "Stefan", "Jelena", "Đorđe", "Ljiljana"]
+LAST_NAMES = ["Petrović", "Jovanović", "Nikolić", "Marković", "Đorđević", "Stojanović", "Ilić", "Pavlović"]
+DIAGNOSES = ["kontrola pritiska", "upala grla", "bol u leđima", "glavobolja", "prehlada", "alergija na polen"]
+
+
+def seed(db_manager, patients, visits_per_patient):
+    rng = random.Random(7)
+    db_manager.add_patients_bulk(
+        ({"name": rng.choice(FIRST_NAMES), "last_name": f"{rng.choice(LAST_NAMES)}{i}",
+          "birthday": f"{rng.randint(1930, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+          "phone_number": f"06{rng.randint(10000000, 99999999)}"}
+         for i in range(patients)),
+        defer_fts=True, defer_indexes=True
+    )
+    db_manager.add_appointments_bulk(
+        ({"id_patient": rng.randint(1, patients),
+          "date": f"{rng.randint(2005, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00",
+          "diagnose_text": f"{rng.choice(DIAGNOSES)} {i}",
+          "diagnose_sound": f"/nonexistent/audio/{i}.wav" if i % 50 == 0 else None}
+         for i in range(patients * visits_per_patient)),
+        defer_fts=True, defer_indexes=True
+    )
+    # Deo pregleda ide u arhivu, da se proveri i archive.appointment
+    db_manager.archive_appointments("2010-01-01")
+
+
+def calls():
+    """(method name, function(db_manager)) for every public method that runs SQL."""
+    patient = {"name": "Proba", "last_name": "Provera", "birthday": "1990-05-05"}
+    return [
+        ("add_patient", lambda db: db.add_patient(**patient)),
+        ("add_patients_bulk", lambda db: db.add_patients_bulk([dict(patient, last_name="Bulk")])),
+        ("import_patients", lambda db: db.import_patients([dict(patient, ref="r1"), dict(patient, ref="r2")])),
+        ("update_patient", lambda db: db.update_patient(10, "Ana", "Anić", "1980-01-01")),
+        ("get_patient", lambda db: db.get_patient(20)),
+        ("get_all_patients", lambda db: db.get_all_patients()),
+        ("iter_patients", lambda db: [next(db.iter_patients()), next(db.iter_patients(after_key=("M", 0))),
+                                      next(db.iter_patients(after_key=500, order_by="id"))]),
+        ("search_patients", lambda db: [db.search_patients(q) for q in ("petrov", "đorđe ilić", "0641", "1978",
+                                                                        "064 12", "15.03.1980", "03.1980",
+                                                                        "petrović 1978", "ana 1990 12")] +
+                                       [db.search_patients(q, mode="phonetic") for q in ("petrovich", "djordje ilich")]),
+        ("get_patient_search_documents", lambda db: db.get_patient_search_documents(range(100, 200))),
+        ("load_name_index", lambda db: db.load_name_index()),
+        ("fuzzy_search_patients", lambda db: [db.fuzzy_search_patients(q) for q in ("petrvić", "jovna nikolc")]),
+        ("add_appointment", lambda db: db.add_appointment(30, "2025-01-01 09:00:00", "kontrola")),
+        ("add_appointments_bulk", lambda db: db.add_appointments_bulk(
+            [{"id_patient": 31, "date": "2025-01-02", "diagnose_text": "bulk"}])),
+        ("update_appointments_bulk", lambda db: db.update_appointments_bulk(
+            [{"appointment_id": 5, "id_patient": 31, "date": "2025-01-03", "diagnose_text": "bulk izmena"}])),
+        ("import_appointments", lambda db: db.import_appointments(
+            [{"patient_ref": "r1", "date": "2025-01-04"},
+             dict(patient, date="2025-01-05", diagnose_text="uvoz")])),
+        ("update_appointment", lambda db: [db.update_appointment(40, 41, "2025-01-06", "izmena"),
+                                           db.update_appointment(_archived_id(db), 41, "2009-01-06", "arhiva")]),
+        ("get_appointment", lambda db: db.get_appointment(50)),
+        ("get_all_appointments", lambda db: db.get_all_appointments()),
+        ("get_appointments_by_patient_id", lambda db: db.get_appointments_by_patient_id(60)),
+        ("iter_appointments", lambda db: [next(db.iter_appointments(60, page_size=2), None),
+                                          next(db.iter_appointments(60, "2030-01-01", before_id=10 ** 9), None),
+                                          next(db.iter_appointments(60, "2030-01-01"), None)]),
+        ("search_appointments", lambda db: [db.search_appointments(q, offset=o)
+                                            for q in ("upala", "kontrola pritiska") for o in (0, 2500)]),
+        ("iter_export", lambda db: sum(len(batch) for batch in db.iter_export())),
+        ("get_appointment_day_counts", lambda db: db.get_appointment_day_counts(2015, 3)),
+        ("get_appointments_by_date", lambda db: db.get_appointments_by_date("2015-03-03")),
+        ("get_patients_by_appointment_date", lambda db: db.get_patients_by_appointment_date("2015-03-03")),
+        ("get_patients_by_appointment_date_print_report",
+         lambda db: db.get_patients_by_appointment_date_print_report("2015-03-03")),
+        ("delete_appointment", lambda db: [db.delete_appointment(70), db.delete_appointment(_archived_id(db))]),
+        ("delete_patient", lambda db: db.delete_patient(80)),
+        ("purge_deleted_audio", lambda db: db.purge_deleted_audio()),
+        ("archive_appointments", lambda db: db.archive_appointments("2011-01-01")),
+        ("archive_old_appointments", lambda db: [setattr(db, "archive_after_days", 365 * 30),
+                                                 db.archive_old_appointments()]),
+    ]
+
+
+def _archived_id(db_manager):
+    return db_manager._get_connection().execute("SELECT MAX(id) FROM archive.appointment").fetchone()[0]
+
+
+def table_aliases(sql):
+    """Maps every name a statement (or the appointment_all view it reads) uses for patient/appointment."""
+    aliases = {}
+    for table, alias in TABLE_REF_RE.findall(sql + "\n" + APPOINTMENT_ALL_VIEW_SQL):
+        table = "appointment" if table.lower() == "appointment_all" else table.lower()
+        if table not in CHECKED_TABLES:
+            continue
+        aliases[table] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def check_statement(conn, sql):
+    """Returns (plan lines, problems) for one traced statement."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    plan = [detail for _, _, _, detail in rows]
+    aliases = table_aliases(sql)
+    has_limit = re.search(r"\bLIMIT\b", sql, re.IGNORECASE) is not None
+    # Kada se appointment_all materijalizuje, spoljni upit čita gotov (već filtriran) rezultat pod imenom pogleda
+    view_names = set()
+    if any(detail in ("MATERIALIZE appointment_all", "CO-ROUTINE appointment_all") for detail in plan):
+        view_names = {alias or "appointment_all" for alias in VIEW_REF_RE.findall(sql)}
+    problems = []
+    for _, parent, _, detail in rows:
+        match = SCAN_RE.match(detail)
+        if match is None or match.group(1) not in aliases:
+            continue
+        if parent == 0 and match.group(1) in view_names:
+            continue
+        if "USING" not in detail:
+            problems.append(f"full table scan: {detail}")
+        elif not has_limit:
+            problems.append(f"full index scan without LIMIT: {detail}")
+    return plan, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--visits-per-patient", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="print every statement with its plan")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager = DatabaseManager(os.path.join(tmp_dir, "database.db"))
+        start = time.perf_counter()
+        seed(db_manager, args.patients, args.visits_per_patient)
+        print(f"seeded {args.patients} patients in {time.perf_counter() - start:.1f} s")
+
+        conn = db_manager._get_connection()
+        covered = set()
+        for name, call in calls():
+            covered.add(name)
+            statements = []
+            steps = [0]
+
+            def count_steps():
+                steps[0] += STEP_GRANULARITY
+                return 0
+
+            conn.set_trace_callback(statements.append)
+            conn.set_progress_handler(count_steps, STEP_GRANULARITY)
+            try:
+                call(db_manager)
+            finally:
+                conn.set_trace_callback(None)
+                conn.set_progress_handler(None, 0)
+
+            problems = []
+            checked = 0
+            for sql in dict.fromkeys(statements):
+                # Naredbe iz trigera stižu kao komentari, a BEGIN/COMMIT/PRAGMA nemaju plan nad tabelama
+                if not re.match(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", sql, re.IGNORECASE):
+                    continue
+                checked += 1
+                plan, statement_problems = check_statement(conn, sql)
+                if args.verbose:
+                    print(f"  {' '.join(sql.split())[:160]}")
+                    for detail in plan:
+                        print(f"      {detail}")
+                if name not in FULL_SCAN_ALLOWED:
+                    problems.extend(f"{problem}\n      in: {' '.join(sql.split())[:200]}"
+                                    for problem in statement_problems)
+            if name not in FULL_SCAN_ALLOWED and name not in STEP_BUDGET_EXEMPT and steps[0] > STEP_BUDGET:
+                problems.append(f"about {steps[0]} VM steps, budget is {STEP_BUDGET}")
+            if checked == 0:
+                problems.append("no statements traced; the call failed or the method no longer runs SQL")
+
+            status = "FAIL" if problems else "ok"
+            reason = FULL_SCAN_ALLOWED.get(name) or STEP_BUDGET_EXEMPT.get(name)
+            note = f" ({reason})" if reason else ""
+            print(f"{status:<4} {name:<48} {checked:3d} statements  ~{steps[0]:>10,} steps{note}")
+            for problem in problems:
+                print(f"    {problem}")
+            failures.extend((name, problem) for problem in problems)
+
+        public = {name for name in dir(DatabaseManager)
+                  if not name.startswith("_") and callable(getattr(DatabaseManager, name))}
+        for name in sorted(public - covered - NO_SQL):
+            print(f"FAIL {name:<48} not covered: add it to calls() or NO_SQL")
+            failures.append((name, "not covered"))
+
+        db_manager.close()
+
+    print(f"{len(failures)} problem(s)" if failures else "all query plans ok")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
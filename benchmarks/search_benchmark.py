@@ -0,0 +1,109 @@
+"""
+Measures DatabaseManager.search_patients and fuzzy_search_patients latency on a large seeded database,
+plus the load time and memory of the trigram name index. First checks that a name match is not crowded out
+of the results by many prefix matches in other columns.
+
+Usage: python benchmarks/search_benchmark.py [--patients N] [--queries N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+
+FIRST_NAMES = ["Petar", "Marko", "Jovana", "Milica", "Nikola", "Ana", "Stefan", "Jelena", "Đorđe", "Ljiljana",
+               "Nemanja", "Dragana", "Miloš", "Tijana", "Vuk", "Katarina", "Luka", "Snežana", "Dušan", "Maja"]
+SYLLABLES = ["pe", "tro", "jo", "va", "ni", "ko", "mar", "đor", "đe", "sto", "ja", "no", "i", "stan", "pav",
+             "lo", "mi", "lo", "še", "po", "ko", "va", "če", "to", "do", "ro", "la", "zi", "si", "živ", "ra", "du"]
+SUFFIXES = ["vić", "ić", "ović", "ević", "in", "ski"]
+
+
+def random_last_name(rng):
+    root = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+    return (root + rng.choice(SUFFIXES)).capitalize()
+
+
+def seed(db_manager, patients):
+    rng = random.Random(42)
+    conn = db_manager._get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO patient (name, last_name, phone_number, birthday) VALUES (?, ?, ?, ?)",
+            (
+                (first, last, f"06{rng.randint(0, 9)}{rng.randint(1000000, 9999999)}",
+                 f"{rng.randint(1930, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+                for _ in range(patients)
+                for first, last in [(rng.choice(FIRST_NAMES), random_last_name(rng))]
+            )
+        )
+
+
+def check_ranking(tmp_dir):
+    """Returns True when search_patients("ana") finds Ana Kovač among 600 notes starting with "ana"."""
+    db_manager = DatabaseManager(os.path.join(tmp_dir, "ranking.db"))
+    try:
+        db_manager.add_patients_bulk(
+            {"name": "Petar", "last_name": f"Petrović{i}", "birthday": "1980-01-01", "note": "anamneza uredna"}
+            for i in range(600)
+        )
+        patient_id = db_manager.add_patient("Ana", "Kovač", "1990-01-01")
+        results = db_manager.search_patients("ana")
+    finally:
+        db_manager.close()
+    found = any(patient.id == patient_id for patient in results)
+    print(f"ranking: {'ok' if found else 'FAIL'}, 'ana' returned {len(results)} hits"
+          f"{'' if found else ' without Ana Kovač'}")
+    return found
+
+
+def measure(search, query, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = search(query)
+        timings.append(time.perf_counter() - start)
+    first = timings[0]  # bez keša; fuzzy_search_patients pamti slične reči upita
+    timings.sort()
+    print(f"{search.__name__:<22} {query!r:<18} {len(results):4d} hits  first {first * 1000:7.2f} ms  "
+          f"median {timings[len(timings) // 2] * 1000:7.2f} ms  "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patients", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    queries = ["petrov", "jovana nik", "đorđe", "marko petrović", "063", "zzz"]
+    # Upiti sa greškama u kucanju, za indeks imena
+    fuzzy_queries = ["jovnović", "petar stnković", "milca", "đorđe pavlvić", "nikola", "qqqq"]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not check_ranking(tmp_dir):
+            sys.exit(1)
+        db_manager = DatabaseManager(os.path.join(tmp_dir, "database.db"))
+        start = time.perf_counter()
+        seed(db_manager, args.patients)
+        print(f"seeded {args.patients} patients in {time.perf_counter() - start:.1f} s")
+
+        for query in queries:
+            measure(db_manager.search_patients, query, args.queries)
+
+        start = time.perf_counter()
+        db_manager.load_name_index()
+        stats = db_manager.name_index_stats()
+        print(f"name index: loaded in {time.perf_counter() - start:.1f} s, {stats['words']} words, "
+              f"{stats['trigrams']} trigrams, ~{stats['memory_bytes'] / 1024 / 1024:.1f} MB")
+        for query in fuzzy_queries:
+            measure(db_manager.fuzzy_search_patients, query, args.queries)
+
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,1156 @@
 import sqlite3
 import os
-import shutil
 import datetime
+import threading
+import itertools
+import time
+import re
+import unicodedata
+from collections import OrderedDict
+from backup_manager import BackupManager, ARCHIVE_BACKUP_PREFIX
+from models import Patient, Appointment, PATIENT_COLUMNS, PATIENT_LIST_COLUMNS, APPOINTMENT_COLUMNS, \
+    APPOINTMENT_LIST_COLUMNS
+from name_index import TrigramIndex
+from text_utils import fold_text, phone_key, phonetic_key, register_sql_functions
 from utils import log_error
 
+# Podrazumevani PRAGMA profil; svaka vrednost može da se pregazi kroz config.json ("database" -> "pragmas")
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,  # negativno = KiB, oko 20 MB
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "wal_autocheckpoint": 1000,
+}
+
+# Koliko pacijenata search_patients najviše vraća; manje od toga znači da je lista pogodaka potpuna
+SEARCH_RESULT_LIMIT = 100
+
+# Oblici reči upita koje search_patients šalje na posebne indekse umesto u FTS: datum rođenja (15.03.1980. ili
+# 1980-03-15), mesec rođenja (03.1980), godina rođenja (1978) i telefon (063, +381 63, 063/42)
+QUERY_DATE_PATTERN = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{4})\.?|(\d{4})-(\d{2})-(\d{2})")
+QUERY_MONTH_PATTERN = re.compile(r"(\d{1,2})\.(\d{4})\.?")
+QUERY_YEAR_PATTERN = re.compile(r"(?:19|20)\d{2}")
+QUERY_PHONE_PATTERN = re.compile(r"\+?[\d()/-]*\d[\d()/-]*")
+
+# Koliko najnovijih pogodaka search_appointments rangira pomoću bm25; stariji idu hronološki iza njih
+APPOINTMENT_RANK_WINDOW = 2000
+
+# Oznake kojima search_appointments obeležava pogođene reči u isečku teksta
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+
+# Verzija šeme arhivske baze (archive.db), čuva se u njenom PRAGMA user_version
+ARCHIVE_SCHEMA_VERSION = 3
+
+# Koliko pregleda archive_appointments premešta u jednoj transakciji
+ARCHIVE_BATCH_SIZE = 5000
+
+# Pauza (u sekundama) između dve transakcije arhiviranja, da upisi iz GUI-ja ne čekaju na zaključavanje
+ARCHIVE_BATCH_PAUSE = 0.05
+
+# Koliko pacijenata get_patient najviše drži u memoriji (LRU)
+PATIENT_CACHE_SIZE = 512
+
+# Migracije šeme: (verzija, metoda DatabaseManager-a). Verzija se čuva u PRAGMA user_version.
+MIGRATIONS = [
+    (1, "_migrate_base_schema"),
+    (2, "_migrate_appointment_indexes"),
+    (3, "_migrate_patient_fts"),
+    (4, "_migrate_appointment_fts"),
+    (5, "_migrate_patient_search_key"),
+    (6, "_migrate_appointment_cascade"),
+    (7, "_migrate_appointment_day_stats"),
+    (8, "_migrate_patient_fts_folded"),
+    (9, "_migrate_patient_phonetic_key"),
+    (10, "_migrate_patient_phone_birthday_indexes"),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Od ovoliko redova se indeksi i FTS rebuild iz migracija grade u pozadini umesto pri pokretanju
+BACKGROUND_TASK_MIN_ROWS = 50000
+
+# Koliko zvučnih zapisa obrisanih pregleda purge_deleted_audio briše po transakciji
+AUDIO_CLEANUP_BATCH_SIZE = 100
+
+# Na koliko sekundi pozadinska nit ponovo pokušava fajlove koji nisu mogli da se obrišu
+AUDIO_JANITOR_INTERVAL = 300
+
+# Jedinstven pogled na aktivne i arhivirane preglede; TEMP jer obična view ne sme da gleda u drugu bazu.
+# Red koji je usred arhiviranja već upisan u arhivu, a još nije obrisan iz glavne baze, vidi se samo jednom.
+APPOINTMENT_ALL_VIEW_SQL = """
+    CREATE TEMP VIEW IF NOT EXISTS appointment_all AS
+    SELECT id, id_patient, date, diagnose_text, diagnose_sound FROM main.appointment
+    UNION ALL
+    SELECT id, id_patient, date, diagnose_text, diagnose_sound FROM archive.appointment a
+    WHERE NOT EXISTS (SELECT 1 FROM main.appointment m WHERE m.id = a.id)
+"""
+
+# Preračunava appointment_day_stats iz svih pregleda šeme (main ili archive)
+DAY_STATS_REBUILD_SQL = (
+    "INSERT OR REPLACE INTO {schema}.appointment_day_stats (day, count, first_id, last_id) "
+    "SELECT substr(date, 1, 10), COUNT(*), MIN(id), MAX(id) FROM {schema}.appointment GROUP BY substr(date, 1, 10)"
+)
+
+# Mapa šifra iz starog programa -> id pacijenta; TEMP tabela, pa je vidi samo konekcija koja uvozi
+IMPORT_REF_TABLE_SQL = "CREATE TEMP TABLE IF NOT EXISTS import_patient_ref (ref TEXT PRIMARY KEY, patient_id INTEGER)"
+
+
+def _interrupted(error):
+    """True for the error a query gets when DatabaseWorker cancels its request with Connection.interrupt()."""
+    return isinstance(error, sqlite3.OperationalError) and str(error) == "interrupted"
+
 
 class DatabaseManager:
-    def __init__(self, db_path):
+    def __init__(self, db_path, config=None):
         self.db_path = db_path
+        config = config or {}
+        self.pragmas = self._build_pragmas(config.get("pragmas"))
         self.base_dir = os.path.dirname(db_path)
         self.audio_dir = os.path.join(self.base_dir, "audio")
         self.backup_dir = os.path.join(self.base_dir, "backup")
+        # Stari pregledi se sele u archive.db, koja se ATTACH-uje na svaku konekciju
+        self.archive_path = os.path.join(self.base_dir, "archive.db")
+        self.archive_after_days = config.get("archive_after_days")
         os.makedirs(self.audio_dir, exist_ok=True)
         os.makedirs(self.backup_dir, exist_ok=True)
+        self.backups = self._build_backup_manager(config.get("backup") or {})
+        # Jedna trajna konekcija po niti, otvara se pri prvom pozivu iz te niti
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._schema_thread = None
+        self._schema_stop = threading.Event()
+        self._janitor_thread = None
+        self._janitor_stop = threading.Event()
+        self._archive_thread = None
+        self._archive_stop = threading.Event()
+        self._janitor_wakeup = threading.Event()
+        self._patient_cache = OrderedDict()  # id -> Patient, poslednji korišćen na kraju
+        self._patient_cache_lock = threading.Lock()
+        self._patient_cache_generation = 0
+        self.patient_cache_hits = 0
+        self.patient_cache_misses = 0
+        # Imena svih pacijenata za pretragu otpornu na greške u kucanju; puni se pri prvoj upotrebi ili
+        # preko load_name_index() iz pozadinske niti
+        self._name_index = TrigramIndex()
+        self._name_index_lock = threading.Lock()  # samo jedno punjenje indeksa u isto vreme
         self.init_db()
 
-    def init_db(self):
+    def _build_backup_manager(self, backup_config):
+        # "mode": "full" (.db.gz kopije) ili "snapshot" (inkrementalni snimci); "include_audio" važi za snimke
+        audio_dir = self.audio_dir if backup_config.get("include_audio") else None
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS patient (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL,
-                        last_name TEXT NOT NULL,
-                        full_name TEXT NOT NULL,
-                        phone_number TEXT,
-                        email TEXT,
-                        gender TEXT,
-                        birthday DATE NOT NULL,
-                        address TEXT,
-                        note TEXT
-                    )
-                """)
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS appointment (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+            return BackupManager(self.db_path, self.backup_dir, keep=backup_config.get("keep", 5),
+                                 mode=backup_config.get("mode", "full"), audio_dir=audio_dir)
+        except ValueError as e:
+            log_error(f"Invalid backup config ignored: {e}")
+            return BackupManager(self.db_path, self.backup_dir, keep=5)
+
+    @staticmethod
+    def _build_pragmas(overrides):
+        pragmas = dict(DEFAULT_PRAGMAS)
+        for name, value in (overrides or {}).items():
+            if name not in DEFAULT_PRAGMAS:
+                log_error(f"Unknown PRAGMA in config ignored: {name}")
+                continue
+            # Vrednosti idu direktno u SQL, pa dozvoljavamo samo brojeve i proste reči
+            if isinstance(value, bool) or not (isinstance(value, int) or (isinstance(value, str) and value.isalnum())):
+                log_error(f"Invalid value for PRAGMA {name} ignored: {value!r}")
+                continue
+            pragmas[name] = value
+        return pragmas
+
+    def _configure_connection(self, conn):
+        """Runs once for every new connection, right after it is opened."""
+        conn.execute("PRAGMA busy_timeout = 5000")
+        # Brisanje pacijenta kaskadno briše njegove preglede; SQLite strane ključeve uključuje po konekciji
+        conn.execute("PRAGMA foreign_keys = ON")
+        # Generisane kolone (patient.search_key, address_key...) računaju se ovim funkcijama
+        register_sql_functions(conn)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA archive.{name} = {value}")
+        if conn.execute("PRAGMA archive.user_version").fetchone()[0] != ARCHIVE_SCHEMA_VERSION:
+            self._init_archive(conn)
+        conn.execute(APPOINTMENT_ALL_VIEW_SQL)
+
+    def _init_archive(self, conn):
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # Isti id kao u glavnoj bazi, pa bez AUTOINCREMENT
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS archive.appointment (
+                        id INTEGER PRIMARY KEY,
                         id_patient INTEGER NOT NULL,
                         date DATETIME NOT NULL,
                         diagnose_text TEXT,
-                        diagnose_sound TEXT,
-                        FOREIGN KEY (id_patient) REFERENCES patient(id)
+                        diagnose_sound TEXT
                     )
                 """)
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_full_name ON patient(full_name)")
-                cursor.execute("""
-                    CREATE TRIGGER IF NOT EXISTS update_full_name
-                    AFTER INSERT OR UPDATE OF name, last_name ON patient
-                    FOR EACH ROW
-                    BEGIN
-                        UPDATE patient SET full_name = NEW.name || ' ' || NEW.last_name WHERE id = NEW.id;
-                    END;
-                """)
-                conn.commit()
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS archive.idx_appointment_patient_date ON appointment(id_patient, date DESC)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS archive.idx_appointment_date_patient ON appointment(date, id_patient)"
+                )
+                for sql in (self._appointment_fts_ddl("archive") + self._audio_cleanup_ddl("archive") +
+                            self._day_stats_ddl("archive")):
+                    conn.execute(sql)
+                conn.execute(DAY_STATS_REBUILD_SQL.format(schema="archive"))
+                conn.execute(f"PRAGMA archive.user_version = {ARCHIVE_SCHEMA_VERSION}")
+        except sqlite3.Error as e:
+            log_error(f"Archive database initialization failed: {e}")
+
+    def _get_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False samo da bi close() mogao da zatvori konekcije svih niti
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._configure_connection(conn)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def connection(self):
+        """The calling thread's connection, opened on first use; e.g. for Connection.interrupt() from another thread."""
+        return self._get_connection()
+
+    def release_connection(self):
+        """Closes the calling thread's connection. Use it at the end of short-lived threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._connections_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def close(self):
+        """Closes every connection opened by this manager. Call it once on shutdown."""
+        self.backups.wait_all()
+        if self._archive_thread is not None:
+            # Premešteni paketi su već sačuvani; ostatak se premešta pri sledećem pokretanju
+            self._archive_stop.set()
+            self._archive_thread.join()
+            self._archive_thread = None
+        if self._schema_thread is not None:
+            # Prekinut zadatak ostaje u schema_task i nastavlja se pri sledećem pokretanju
+            self._schema_stop.set()
+            self._schema_thread.join()
+            self._schema_thread = None
+        if self._janitor_thread is not None:
+            self._janitor_stop.set()
+            self._janitor_wakeup.set()
+            self._janitor_thread.join()
+            self._janitor_thread = None
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        if connections and str(self.pragmas.get("journal_mode")).upper() == "WAL":
+            # Prebaci WAL u glavnu bazu da sledeće pokretanje krene od malog -wal fajla
+            try:
+                connections[0].execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                log_error(f"WAL checkpoint on close failed: {e}")
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                log_error(f"Closing database connection failed: {e}")
+
+    def init_db(self):
+        """
+        Brings the schema up to SCHEMA_VERSION. A current database costs a single PRAGMA read, also while
+        deferred tasks are pending (negative version); those are left to start_schema_tasks().
+        """
+        try:
+            conn = self._get_connection()
+            if abs(conn.execute("PRAGMA user_version").fetchone()[0]) == SCHEMA_VERSION:
+                return
+            # Migracije prave tabele iznova (DROP + RENAME), što uključeni strani ključevi ne dozvoljavaju;
+            # PRAGMA foreign_keys ne sme da se menja usred transakcije
+            conn.execute("PRAGMA foreign_keys = OFF")
+            try:
+                with conn:
+                    cursor = conn.cursor()
+                    # IMMEDIATE: druga instanca aplikacije čeka umesto da paralelno migrira istu bazu
+                    cursor.execute("BEGIN IMMEDIATE")
+                    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+                    current = abs(version)
+                    if current > SCHEMA_VERSION:
+                        log_error(f"Database schema version {current} is newer than this application ({SCHEMA_VERSION})")
+                        return
+                    for number, method in MIGRATIONS:
+                        if number > current:
+                            getattr(self, method)(cursor)
+                    for table, rowid, parent, _ in cursor.execute("PRAGMA main.foreign_key_check").fetchall():
+                        log_error(f"Foreign key violation after migration: {table} row {rowid} -> {parent}")
+                    cursor.execute("SELECT COUNT(*) FROM schema_task")
+                    pending = cursor.fetchone()[0]
+                    # Negativna verzija znači: šema je na toj verziji, ali pozadinski zadaci još nisu gotovi
+                    cursor.execute(f"PRAGMA user_version = {-SCHEMA_VERSION if pending else SCHEMA_VERSION}")
+            finally:
+                conn.execute("PRAGMA foreign_keys = ON")
         except sqlite3.Error as e:
             log_error(f"Database initialization failed: {e}")
 
-    def backup_db(self):
+    def _queue_or_run(self, cursor, table, description, sql):
+        """Runs `sql` inside the migration, or queues it for run_schema_tasks() when `table` is large."""
+        # Isti zadatak iz ranije migracije gađa objekat koji je ova migracija obrisala i napravila iznova
+        # (patient_fts, indeksi pregleda); ostaje samo poslednji, da se ista izgradnja ne radi više puta
+        cursor.execute("DELETE FROM schema_task WHERE sql = ?", (sql,))
+        cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        if (cursor.fetchone()[0] or 0) < BACKGROUND_TASK_MIN_ROWS:
+            cursor.execute(sql)
+        else:
+            cursor.execute("INSERT INTO schema_task (description, sql) VALUES (?, ?)", (description, sql))
+
+    def has_pending_schema_tasks(self):
         try:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = os.path.join(self.backup_dir, f"database_{timestamp}.bak")
-            shutil.copy(self.db_path, backup_path)
-            # Keep last 5 backups
-            backups = sorted(os.listdir(self.backup_dir), reverse=True)
-            for old_backup in backups[5:]:
-                os.remove(os.path.join(self.backup_dir, old_backup))
-        except Exception as e:
-            log_error(f"Database backup failed: {e}")
+            return self._get_connection().execute("PRAGMA user_version").fetchone()[0] < 0
+        except sqlite3.Error as e:
+            log_error(f"Reading schema version failed: {e}")
+            return False
+
+    def run_schema_tasks(self, progress_callback=None, stop_event=None):
+        """
+        Runs the index and FTS builds that migrations deferred, one transaction per task.
+
+        progress_callback(done, total, description) is called before each task and once at the end.
+        Setting stop_event interrupts the running statement; the task stays queued for the next start.
+        Returns True when no tasks are left.
+        """
+        conn = self._get_connection()
+        try:
+            tasks = conn.execute("SELECT id, description, sql FROM schema_task ORDER BY id").fetchall()
+        except sqlite3.Error as e:
+            log_error(f"Reading schema tasks failed: {e}")
+            return False
+        if stop_event is not None:
+            # Vraća 1 (prekid) čim se zatraži zaustavljanje, i usred CREATE INDEX
+            conn.set_progress_handler(lambda: 1 if stop_event.is_set() else 0, 10000)
+        try:
+            for done, (task_id, description, sql) in enumerate(tasks):
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                if progress_callback:
+                    progress_callback(done, len(tasks), description)
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.execute(sql)
+                    conn.execute("DELETE FROM schema_task WHERE id = ?", (task_id,))
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("SELECT COUNT(*) FROM schema_task").fetchone()[0] == 0:
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            if progress_callback:
+                progress_callback(len(tasks), len(tasks), "")
+            return True
+        except sqlite3.Error as e:
+            if not (stop_event is not None and stop_event.is_set()):
+                log_error(f"Schema task failed: {e}")
+            return False
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def start_schema_tasks(self, progress_callback=None, finished_callback=None):
+        """
+        Runs run_schema_tasks() on a background thread; close() stops it. Returns False and does nothing when
+        none are pending. Every task holds the write lock until it is done, so writes from other connections
+        wait or fail with "database is locked" meanwhile; finished_callback(success) is called from the
+        thread when it stops, so the caller can allow edits again.
+        """
+        if self._schema_thread is not None or not self.has_pending_schema_tasks():
+            return False
+
+        def run():
+            success = False
+            try:
+                success = self.run_schema_tasks(progress_callback, self._schema_stop)
+            finally:
+                self.release_connection()
+                if finished_callback:
+                    finished_callback(success)
+
+        self._schema_thread = threading.Thread(target=run, name="db-schema-tasks", daemon=True)
+        self._schema_thread.start()
+        return True
+
+    def purge_deleted_audio(self, batch_size=AUDIO_CLEANUP_BATCH_SIZE, stop_event=None):
+        """
+        Deletes the audio files queued in audio_cleanup (main and archive), one transaction per batch.
+        A path leaves the queue only after its file is gone, so a crash just repeats the batch on the next run.
+        Files that cannot be deleted now (e.g. opened by a player) stay queued. Returns the number of deleted files.
+        """
+        removed = 0
+        try:
+            conn = self._get_connection()
+            for schema in ("main", "archive"):
+                last_rowid = 0
+                while not (stop_event is not None and stop_event.is_set()):
+                    rows = conn.execute(
+                        f"SELECT rowid, path FROM {schema}.audio_cleanup WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                        (last_rowid, batch_size)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    done = []
+                    for rowid, path in rows:
+                        try:
+                            os.remove(path)
+                            removed += 1
+                        except FileNotFoundError:
+                            pass
+                        except OSError as e:
+                            log_error(f"Deleting audio file {path} failed: {e}")
+                            continue
+                        done.append((rowid,))
+                    with conn:
+                        conn.execute("BEGIN IMMEDIATE")
+                        conn.executemany(f"DELETE FROM {schema}.audio_cleanup WHERE rowid = ?", done)
+                    last_rowid = rows[-1][0]
+        except sqlite3.Error as e:
+            log_error(f"Audio cleanup failed: {e}")
+        return removed
+
+    def start_audio_janitor(self):
+        """
+        Starts the background thread that runs purge_deleted_audio() now, after every delete and every
+        AUDIO_JANITOR_INTERVAL seconds, each time after the running backups are done; close() stops it.
+        """
+        if self._janitor_thread is not None:
+            return
+
+        def run():
+            try:
+                while not self._janitor_stop.is_set():
+                    self._janitor_wakeup.clear()
+                    # Rezerva pokrenuta pre brisanja još kopira zvučne zapise obrisanih pregleda ("include_audio");
+                    # fajlovi se brišu tek kada je ona gotova
+                    self.backups.wait_all()
+                    self.purge_deleted_audio(stop_event=self._janitor_stop)
+                    self._janitor_wakeup.wait(AUDIO_JANITOR_INTERVAL)
+            finally:
+                self.release_connection()
+
+        self._janitor_thread = threading.Thread(target=run, name="db-audio-janitor", daemon=True)
+        self._janitor_thread.start()
+
+    # === Migracije, redom po verziji; nova migracija se samo dopisuje na kraj MIGRATIONS ===
+
+    def _migrate_base_schema(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS patient (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                full_name TEXT NOT NULL,
+                phone_number TEXT,
+                email TEXT,
+                gender TEXT,
+                birthday DATE NOT NULL,
+                address TEXT,
+                note TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS appointment (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_patient INTEGER NOT NULL,
+                date DATETIME NOT NULL,
+                diagnose_text TEXT,
+                diagnose_sound TEXT,
+                FOREIGN KEY (id_patient) REFERENCES patient(id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_full_name ON patient(full_name)")
+        # Spori koraci migracija koji se završavaju u pozadini; preživljavaju pad aplikacije
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_task (
+                id INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                sql TEXT NOT NULL
+            )
+        """)
+
+    def _migrate_appointment_indexes(self, cursor):
+        self._queue_or_run(
+            cursor, "appointment", "Indeks pregleda po datumu",
+            "CREATE INDEX IF NOT EXISTS idx_appointment_date_patient ON appointment(date, id_patient)"
+        )
+        self._queue_or_run(
+            cursor, "appointment", "Indeks pregleda po pacijentu",
+            "CREATE INDEX IF NOT EXISTS idx_appointment_patient_date ON appointment(id_patient, date DESC)"
+        )
+
+    def _migrate_patient_fts(self, cursor):
+        # External-content FTS5: tekst se ne duplira, indeks prati tabelu patient preko trigera
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts USING fts5(
+                full_name, phone_number, email, address, note,
+                content='patient', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS patient_fts_insert AFTER INSERT ON patient BEGIN
+                INSERT INTO patient_fts(rowid, full_name, phone_number, email, address, note)
+                VALUES (new.id, new.full_name, new.phone_number, new.email, new.address, new.note);
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS patient_fts_delete AFTER DELETE ON patient BEGIN
+                INSERT INTO patient_fts(patient_fts, rowid, full_name, phone_number, email, address, note)
+                VALUES ('delete', old.id, old.full_name, old.phone_number, old.email, old.address, old.note);
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS patient_fts_update AFTER UPDATE ON patient BEGIN
+                INSERT INTO patient_fts(patient_fts, rowid, full_name, phone_number, email, address, note)
+                VALUES ('delete', old.id, old.full_name, old.phone_number, old.email, old.address, old.note);
+                INSERT INTO patient_fts(rowid, full_name, phone_number, email, address, note)
+                VALUES (new.id, new.full_name, new.phone_number, new.email, new.address, new.note);
+            END;
+        """)
+        # Postojeća baza: popuni indeks iz pacijenata koji su već upisani
+        self._queue_or_run(
+            cursor, "patient", "Indeks pretrage pacijenata",
+            "INSERT INTO patient_fts(patient_fts) VALUES ('rebuild')"
+        )
+
+    def _migrate_appointment_fts(self, cursor):
+        for sql in self._appointment_fts_ddl("main"):
+            cursor.execute(sql)
+        self._queue_or_run(
+            cursor, "appointment", "Indeks pretrage izveštaja",
+            "INSERT INTO appointment_fts(appointment_fts) VALUES ('rebuild')"
+        )
+
+    def _migrate_patient_search_key(self, cursor):
+        # full_name i search_key od sada računa baza. ALTER TABLE ne može da doda STORED kolonu,
+        # pa se tabela pravi iznova; id-jevi i AUTOINCREMENT brojač ostaju isti.
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'patient'")
+        row = cursor.fetchone()
+        cursor.execute("DROP TABLE IF EXISTS patient_fts")
+        cursor.execute("""
+            CREATE TABLE patient_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                full_name TEXT GENERATED ALWAYS AS (name || ' ' || last_name) VIRTUAL,
+                phone_number TEXT,
+                email TEXT,
+                gender TEXT,
+                birthday DATE NOT NULL,
+                address TEXT,
+                note TEXT,
+                search_key TEXT GENERATED ALWAYS AS (fold_text(name || ' ' || last_name)) STORED
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO patient_new (id, name, last_name, phone_number, email, gender, birthday, address, note)
+            SELECT id, name, last_name, phone_number, email, gender, birthday, address, note FROM patient
+        """)
+        cursor.execute("DROP TABLE patient")
+        cursor.execute("ALTER TABLE patient_new RENAME TO patient")
+        if row is not None:
+            cursor.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'patient'", (row[0],))
+        cursor.execute("CREATE INDEX idx_full_name ON patient(full_name)")
+        cursor.execute("CREATE INDEX idx_patient_search_key ON patient(search_key)")
+        # FTS indeksira i search_key, pa "Pavlovic" nalazi i "Pavlović" i "Павловић"
+        cursor.execute("""
+            CREATE VIRTUAL TABLE patient_fts USING fts5(
+                full_name, search_key, phone_number, email, address, note,
+                content='patient', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+        columns = "full_name, search_key, phone_number, email, address, note"
+        new_values = "new.full_name, new.search_key, new.phone_number, new.email, new.address, new.note"
+        old_values = "old.full_name, old.search_key, old.phone_number, old.email, old.address, old.note"
+        cursor.execute(f"""
+            CREATE TRIGGER patient_fts_insert AFTER INSERT ON patient BEGIN
+                INSERT INTO patient_fts(rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER patient_fts_delete AFTER DELETE ON patient BEGIN
+                INSERT INTO patient_fts(patient_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END;
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER patient_fts_update AFTER UPDATE ON patient BEGIN
+                INSERT INTO patient_fts(patient_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO patient_fts(rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+        """)
+        self._queue_or_run(
+            cursor, "patient", "Indeks pretrage pacijenata",
+            "INSERT INTO patient_fts(patient_fts) VALUES ('rebuild')"
+        )
+
+    def _migrate_appointment_cascade(self, cursor):
+        # Strani ključ ne može da se izmeni kroz ALTER TABLE, pa se tabela pravi iznova sa ON DELETE CASCADE;
+        # id-jevi ostaju isti, pa appointment_fts (external content) ostaje važeći.
+        for sql in self._audio_cleanup_ddl("main"):
+            cursor.execute(sql)
+        # Pregledi pacijenata koji više ne postoje (ostaci prekinutog brisanja) ne bi prošli strani ključ.
+        # Medicinski zapisi se ne brišu: sklanjaju se u appointment_orphan, sa zvučnim zapisima netaknutim.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS appointment_orphan (
+                id INTEGER PRIMARY KEY,
+                id_patient INTEGER NOT NULL,
+                date DATETIME NOT NULL,
+                diagnose_text TEXT,
+                diagnose_sound TEXT
+            )
+        """)
+        cursor.execute(
+            "INSERT OR REPLACE INTO appointment_orphan (id, id_patient, date, diagnose_text, diagnose_sound) "
+            "SELECT id, id_patient, date, diagnose_text, diagnose_sound FROM appointment "
+            "WHERE id_patient NOT IN (SELECT id FROM patient)"
+        )
+        orphans = cursor.rowcount
+        if orphans:
+            log_error(f"Kept {orphans} appointments of missing patients in appointment_orphan")
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'appointment'")
+        row = cursor.fetchone()
+        # RENAME proverava i TEMP poglede, a appointment_all bi između DROP i RENAME gledao u nepostojeću tabelu
+        cursor.execute("DROP VIEW IF EXISTS temp.appointment_all")
+        cursor.execute("""
+            CREATE TABLE appointment_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_patient INTEGER NOT NULL,
+                date DATETIME NOT NULL,
+                diagnose_text TEXT,
+                diagnose_sound TEXT,
+                FOREIGN KEY (id_patient) REFERENCES patient(id) ON DELETE CASCADE
+            )
+        """)
+        # DROP TABLE ne pokreće trigere, pa sklonjeni pregledi ne stižu ni u audio_cleanup ni do appointment_fts
+        cursor.execute(
+            "INSERT INTO appointment_new (id, id_patient, date, diagnose_text, diagnose_sound) "
+            "SELECT id, id_patient, date, diagnose_text, diagnose_sound FROM appointment "
+            "WHERE id_patient IN (SELECT id FROM patient)"
+        )
+        cursor.execute("DROP TABLE appointment")
+        cursor.execute("ALTER TABLE appointment_new RENAME TO appointment")
+        if row is not None:
+            cursor.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'appointment'", (row[0],))
+        cursor.execute(APPOINTMENT_ALL_VIEW_SQL)
+        # DROP TABLE je obrisao i indekse i trigere stare tabele
+        self._migrate_appointment_indexes(cursor)
+        for sql in self._appointment_fts_ddl("main") + self._audio_cleanup_ddl("main"):
+            cursor.execute(sql)
+        if orphans:
+            # Indeks pretrage izveštaja je i dalje sadržao sklonjene preglede
+            self._queue_or_run(
+                cursor, "appointment", "Indeks pretrage izveštaja",
+                "INSERT INTO appointment_fts(appointment_fts) VALUES ('rebuild')"
+            )
+
+    def _migrate_appointment_day_stats(self, cursor):
+        for sql in self._day_stats_ddl("main"):
+            cursor.execute(sql)
+        # Trigeri vode računa o novim pregledima od ovog trenutka; zadatak preračunava sve dane iznova
+        self._queue_or_run(
+            cursor, "appointment", "Broj pregleda po danima", DAY_STATS_REBUILD_SQL.format(schema="main")
+        )
+
+    def _migrate_patient_fts_folded(self, cursor):
+        # Adresa i napomena se, kao i ime (search_key), indeksiraju samo u fold_text obliku, pa latinica,
+        # ćirilica i tekst bez kvačica daju isti token. VIRTUAL kolone ALTER TABLE može da doda bez kopiranja
+        # tabele; računaju se samo kada ih čitaju FTS trigeri i rebuild.
+        for column, source in (("address_key", "address"), ("note_key", "note")):
+            cursor.execute(
+                f"ALTER TABLE patient ADD COLUMN {column} TEXT GENERATED ALWAYS AS (fold_text({source})) VIRTUAL"
+            )
+        for trigger in ("patient_fts_insert", "patient_fts_delete", "patient_fts_update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute("DROP TABLE IF EXISTS patient_fts")
+        # Telefon i email ostaju kako su upisani: fold_text bi "dj" u adresi pošte pretvorio u "d"
+        cursor.execute("""
+            CREATE VIRTUAL TABLE patient_fts USING fts5(
+                search_key, phone_number, email, address_key, note_key,
+                content='patient', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+        columns = "search_key, phone_number, email, address_key, note_key"
+        new_values = "new.search_key, new.phone_number, new.email, new.address_key, new.note_key"
+        old_values = "old.search_key, old.phone_number, old.email, old.address_key, old.note_key"
+        cursor.execute(f"""
+            CREATE TRIGGER patient_fts_insert AFTER INSERT ON patient BEGIN
+                INSERT INTO patient_fts(rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER patient_fts_delete AFTER DELETE ON patient BEGIN
+                INSERT INTO patient_fts(patient_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END;
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER patient_fts_update AFTER UPDATE ON patient BEGIN
+                INSERT INTO patient_fts(patient_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO patient_fts(rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+        """)
+        self._queue_or_run(
+            cursor, "patient", "Indeks pretrage pacijenata",
+            "INSERT INTO patient_fts(patient_fts) VALUES ('rebuild')"
+        )
+
+    def _migrate_patient_phonetic_key(self, cursor):
+        # Prezime pa ime, kao u kartoteci; vrednost se računa pri upisu u indeks, pa je održava sama baza
+        cursor.execute(
+            "ALTER TABLE patient ADD COLUMN phonetic_key TEXT "
+            "GENERATED ALWAYS AS (phonetic_key(last_name) || ' ' || phonetic_key(name)) VIRTUAL"
+        )
+        self._queue_or_run(
+            cursor, "patient", "Fonetski indeks pacijenata",
+            "CREATE INDEX IF NOT EXISTS idx_patient_phonetic_key ON patient(phonetic_key)"
+        )
+
+    def _migrate_patient_phone_birthday_indexes(self, cursor):
+        # Telefon se traži po prefiksu cifara, bez obzira na to da li je upisan kao "063/123-45-67" ili "+381 63..."
+        cursor.execute(
+            "ALTER TABLE patient ADD COLUMN phone_key TEXT GENERATED ALWAYS AS (phone_key(phone_number)) VIRTUAL"
+        )
+        self._queue_or_run(
+            cursor, "patient", "Indeks telefona pacijenata",
+            "CREATE INDEX IF NOT EXISTS idx_patient_phone_key ON patient(phone_key)"
+        )
+        self._queue_or_run(
+            cursor, "patient", "Indeks datuma rođenja pacijenata",
+            "CREATE INDEX IF NOT EXISTS idx_patient_birthday ON patient(birthday)"
+        )
+
+    @staticmethod
+    def _day_stats_ddl(schema):
+        """
+        Per-day appointment count with the lowest and highest appointment id of the day, in `schema` (main or
+        archive), kept current by triggers on appointment. Removing a day's first or last appointment
+        re-reads that one day through idx_appointment_date_patient.
+        """
+        insert = """
+                INSERT INTO appointment_day_stats (day, count, first_id, last_id)
+                VALUES (substr(new.date, 1, 10), 1, new.id, new.id)
+                ON CONFLICT (day) DO UPDATE SET count = count + 1, first_id = min(first_id, excluded.first_id),
+                    last_id = max(last_id, excluded.last_id);
+        """
+        delete = """
+                UPDATE appointment_day_stats SET
+                    count = count - 1,
+                    first_id = CASE WHEN first_id = old.id THEN (
+                        SELECT MIN(id) FROM appointment WHERE date >= day AND date < date(day, '+1 day')
+                    ) ELSE first_id END,
+                    last_id = CASE WHEN last_id = old.id THEN (
+                        SELECT MAX(id) FROM appointment WHERE date >= day AND date < date(day, '+1 day')
+                    ) ELSE last_id END
+                WHERE day = substr(old.date, 1, 10);
+                DELETE FROM appointment_day_stats WHERE day = substr(old.date, 1, 10) AND count <= 0;
+        """
+        return [
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.appointment_day_stats (
+                day TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                first_id INTEGER,
+                last_id INTEGER
+            ) WITHOUT ROWID
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.appointment_day_stats_insert AFTER INSERT ON appointment BEGIN
+                {insert}
+            END;
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.appointment_day_stats_delete AFTER DELETE ON appointment BEGIN
+                {delete}
+            END;
+            """,
+            # Pregled premešten na drugi dan: kao brisanje sa starog i upis na novi dan
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.appointment_day_stats_update AFTER UPDATE OF date ON appointment
+            WHEN substr(old.date, 1, 10) IS NOT substr(new.date, 1, 10) BEGIN
+                {delete}
+                {insert}
+            END;
+            """,
+        ]
+
+    @staticmethod
+    def _audio_cleanup_ddl(schema):
+        """
+        Queue of audio files whose appointments were deleted in `schema` (main or archive). The trigger fills it
+        in the deleting transaction, cascades included; purge_deleted_audio() removes the files later.
+        """
+        return [
+            f"CREATE TABLE IF NOT EXISTS {schema}.audio_cleanup (path TEXT PRIMARY KEY)",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.appointment_audio_cleanup AFTER DELETE ON appointment
+            WHEN old.diagnose_sound IS NOT NULL BEGIN
+                INSERT OR IGNORE INTO audio_cleanup (path) VALUES (old.diagnose_sound);
+            END;
+            """,
+        ]
+
+    @staticmethod
+    def _appointment_fts_ddl(schema):
+        """FTS5 index over appointment.diagnose_text in `schema` (main or archive), with its sync triggers."""
+        return [
+            f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.appointment_fts USING fts5(
+                diagnose_text,
+                content='appointment', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='3'
+            )
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.appointment_fts_insert AFTER INSERT ON appointment BEGIN
+                INSERT INTO appointment_fts(rowid, diagnose_text) VALUES (new.id, new.diagnose_text);
+            END;
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.appointment_fts_delete AFTER DELETE ON appointment BEGIN
+                INSERT INTO appointment_fts(appointment_fts, rowid, diagnose_text)
+                VALUES ('delete', old.id, old.diagnose_text);
+            END;
+            """,
+            # Samo izmena teksta menja indeks; promena datuma ili zvuka ga ne dira
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.appointment_fts_update AFTER UPDATE OF diagnose_text ON appointment
+            BEGIN
+                INSERT INTO appointment_fts(appointment_fts, rowid, diagnose_text)
+                VALUES ('delete', old.id, old.diagnose_text);
+                INSERT INTO appointment_fts(rowid, diagnose_text) VALUES (new.id, new.diagnose_text);
+            END;
+            """,
+        ]
+
+    @staticmethod
+    def _fts_prefix_query(text):
+        """Turns free text into an FTS5 query where every word is matched as a prefix."""
+        return " ".join(f'"{token}"*' for token in re.findall(r"\w+", text))
+
+    @staticmethod
+    def _patient_fts_query(text):
+        """
+        FTS5 query for patient_fts: every word has to match, as a prefix, either the folded columns in its
+        fold_text() form or the phone/email columns as typed. "Petrovic", "Petrović" and "Петровић" all
+        become the same "petrovic" term.
+        """
+        terms = []
+        for token in re.findall(r"\w+", text):
+            folded = " ".join(re.findall(r"\w+", fold_text(token))) or token
+            terms.append(f'({{search_key address_key note_key}} : "{folded}"* OR {{phone_number email}} : "{token}"*)')
+        return " AND ".join(terms)
+
+    @staticmethod
+    def _fts_tokens(text):
+        # Približno kao unicode61 tokenizer sa remove_diacritics: mala slova, bez kvačica, "_" razdvaja reči
+        text = unicodedata.normalize("NFKD", str(text).lower())
+        return re.findall(r"[^\W_]+", "".join(c for c in text if not unicodedata.combining(c)))
+
+    @staticmethod
+    def patient_matches_query(document, query):
+        """
+        True when a patient matches a text-mode search_patients query, judged in memory from the
+        document returned by get_patient_search_documents. Lets a caller narrow earlier results when the
+        query grows instead of searching again.
+        """
+        folded_words, raw_words = document
+        for token in re.findall(r"\w+", query):
+            folded = DatabaseManager._fts_tokens(fold_text(token))
+            raw = DatabaseManager._fts_tokens(token)
+            if not (DatabaseManager._has_prefix_phrase(folded_words, folded) or
+                    DatabaseManager._has_prefix_phrase(raw_words, raw)):
+                return False
+        return True
+
+    @staticmethod
+    def _has_prefix_phrase(words, phrase):
+        # Kao FTS fraza "a b"*: reči redom, poslednja kao prefiks
+        if not phrase:
+            return False
+        last = len(phrase) - 1
+        return any(
+            list(words[i:i + last]) == phrase[:last] and words[i + last].startswith(phrase[last])
+            for i in range(len(words) - last)
+        )
+
+    @staticmethod
+    def parse_patient_query(query):
+        """
+        Splits a patient search query into (kind, value) terms, in order:
+        ("date", "1980-03-15") for 15.03.1980, ("month", ("1980-03-01", "1980-04-01")) for 03.1980,
+        ("year", 1978), ("phone", "06342") for a number starting with 0 or + together with every digit group
+        typed after it ("063 42", "064 2012 345"), ("number", 1234) for other numbers (card number) and ("text", word).
+        """
+        terms = []
+        for token in query.split():
+            # "064 2012 345": grupe cifara posle telefona su nastavak istog broja, a ne godina ili karton
+            if terms and terms[-1][0] == "phone" and not token.startswith("+") \
+                    and QUERY_PHONE_PATTERN.fullmatch(token):
+                terms[-1] = ("phone", terms[-1][1] + phone_key(token))
+                continue
+            date = QUERY_DATE_PATTERN.fullmatch(token)
+            month = QUERY_MONTH_PATTERN.fullmatch(token)
+            if date:
+                day, month_number, year = (date.group(1, 2, 3) if date.group(1) else
+                                           reversed(date.group(4, 5, 6)))
+                try:
+                    terms.append(("date", datetime.date(int(year), int(month_number), int(day)).isoformat()))
+                    continue
+                except ValueError:
+                    pass  # npr. 31.02.1980: ostaje običan tekst
+            elif month and 1 <= int(month.group(1)) <= 12:
+                first = datetime.date(int(month.group(2)), int(month.group(1)), 1)
+                following = (first + datetime.timedelta(days=31)).replace(day=1)
+                terms.append(("month", (first.isoformat(), following.isoformat())))
+                continue
+            if QUERY_YEAR_PATTERN.fullmatch(token):
+                terms.append(("year", int(token)))
+            elif QUERY_PHONE_PATTERN.fullmatch(token) and (phone_key(token) or "").startswith("0"):
+                terms.append(("phone", phone_key(token)))
+            elif token.isdigit():
+                terms.append(("number", int(token)))
+            else:
+                terms.append(("text", token))
+        return terms
+
+    @staticmethod
+    def is_structured_query(query):
+        """True when search_patients answers `query` from the birthday or phone indexes, not from FTS alone."""
+        return any(kind in ("date", "month", "year", "phone")
+                   for kind, _ in DatabaseManager.parse_patient_query(query))
+
+    @staticmethod
+    def _make_snippet(text, tokens, words=16):
+        """
+        Cuts a window of `words` words around the first match and marks every word that starts with
+        one of the query tokens. Matching ignores case and diacritics, like the FTS tokenizer.
+        """
+        def fold(word):
+            return "".join(c for c in unicodedata.normalize("NFD", word.lower()) if not unicodedata.combining(c))
+
+        prefixes = [fold(token) for token in tokens]
+        parts = re.split(r"(\w+)", text or "")  # neparni indeksi su reči
+        word_positions = list(range(1, len(parts), 2))
+        hits = {i for i in word_positions if any(fold(parts[i]).startswith(p) for p in prefixes)}
+        for i in hits:
+            parts[i] = f"{SNIPPET_START}{parts[i]}{SNIPPET_END}"
+
+        if len(word_positions) <= words:
+            return "".join(parts).strip()
+        first_hit = min(hits) if hits else 1
+        start = max(0, min(word_positions.index(first_hit) - words // 4, len(word_positions) - words))
+        begin = word_positions[start]
+        end = word_positions[start + words - 1] + 1
+        prefix = "…" if start > 0 else ""
+        suffix = "…" if start + words < len(word_positions) else ""
+        return prefix + "".join(parts[begin:end]) + suffix
+
+    @staticmethod
+    def _day_range(date):
+        """Returns the half-open ['YYYY-MM-DD', next day) range for a date, datetime or ISO string."""
+        if isinstance(date, datetime.datetime):
+            day = date.date()
+        elif isinstance(date, datetime.date):
+            day = date
+        else:
+            day = datetime.date.fromisoformat(str(date)[:10])
+        return day.isoformat(), (day + datetime.timedelta(days=1)).isoformat()
+
+    def backup_db(self, progress_callback=None):
+        """
+        Starts an online backup and returns its BackupJob as soon as the backup's snapshot is taken.
+        Copying, verification and compression continue in the background; job.wait() blocks until done.
+        """
+        return self.backups.start_backup(progress_callback)
 
     def add_patient(self, name, last_name, birthday, phone_number=None, email=None, gender=None, address=None,
                     note=None):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "INSERT INTO patient (name, last_name, full_name, phone_number, email, gender, birthday, address, note) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                    (name, last_name, f"{name} {last_name}", phone_number, email, gender, birthday, address, note)
+                    "INSERT INTO patient (name, last_name, phone_number, email, gender, birthday, address, note) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (name, last_name, phone_number, email, gender, birthday, address, note)
                 )
                 conn.commit()
+                self.invalidate_patient(cursor.lastrowid)
+                self._name_index.add(cursor.lastrowid, fold_text(f"{name} {last_name}"))
                 return cursor.lastrowid
         except sqlite3.Error as e:
             log_error(f"Add patient failed: {e}")
             return None
 
+    def add_patients_bulk(self, patients, batch_size=1000, defer_fts=False, defer_indexes=False):
+        """
+        Inserts an iterable of patient dicts (same keys as add_patient's arguments) in one transaction.
+        Input is consumed lazily in batches of `batch_size`. Returns {"rows", "changed", "seconds",
+        "rows_per_second"}, where "changed" counts the rows actually inserted or updated, or None if the
+        transaction was rolled back.
+        """
+        rows = (
+            (p["name"], p["last_name"], p.get("phone_number"), p.get("email"), p.get("gender"), p["birthday"],
+             p.get("address"), p.get("note"))
+            for p in patients
+        )
+        return self._bulk_write(
+            "INSERT INTO patient (name, last_name, phone_number, email, gender, birthday, address, note) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows, "patient", batch_size, defer_fts, defer_indexes
+        )
+
+    def _bulk_write(self, sql, rows, table, batch_size, defer_fts, defer_indexes):
+        # Više naredbi (npr. izmena u glavnoj bazi pa u arhivi) dobija svaku grupu redom
+        statements = (sql,) if isinstance(sql, str) else sql
+        start = time.perf_counter()
+        count = 0
+        changed = 0
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+                deferred = self._drop_deferred_objects(cursor, table, defer_fts, defer_indexes)
+                rows = iter(rows)
+                while True:
+                    batch = list(itertools.islice(rows, batch_size))
+                    if not batch:
+                        break
+                    for statement in statements:
+                        cursor.executemany(statement, batch)
+                        changed += cursor.rowcount
+                    count += len(batch)
+                self._restore_deferred_objects(cursor, table, deferred)
+            if table == "patient":
+                self.invalidate_patient()
+                self._name_index.invalidate()
+        except (sqlite3.Error, KeyError) as e:
+            log_error(f"Bulk write into {table} failed after {count} rows: {e}")
+            return None
+        elapsed = time.perf_counter() - start
+        return {
+            "rows": count,
+            "changed": changed,
+            "seconds": elapsed,
+            "rows_per_second": count / elapsed if elapsed > 0 else float(count),
+        }
+
+    @staticmethod
+    def _drop_deferred_objects(cursor, table, defer_fts, defer_indexes):
+        """Drops FTS sync triggers and/or secondary indexes of `table`, returning their DDL for later."""
+        conditions = []
+        if defer_fts:
+            conditions.append(f"(type = 'trigger' AND name LIKE '{table}_fts_%')")
+        if defer_indexes:
+            conditions.append("(type = 'index' AND sql IS NOT NULL)")
+        if not conditions:
+            return []
+        cursor.execute(
+            f"SELECT type, name, sql FROM sqlite_master WHERE tbl_name = ? AND ({' OR '.join(conditions)})",
+            (table,)
+        )
+        deferred = cursor.fetchall()
+        for object_type, name, _ in deferred:
+            cursor.execute(f'DROP {object_type.upper()} "{name}"')
+        return deferred
+
+    @staticmethod
+    def _restore_deferred_objects(cursor, table, deferred):
+        for _, _, sql in deferred:
+            cursor.execute(sql)
+        if any(object_type == "trigger" for object_type, _, _ in deferred):
+            # Triggeri nisu radili tokom upisa, pa se FTS indeks pravi iznova iz tabele
+            cursor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+    def import_patients(self, patients, batch_size=1000, progress_callback=None):
+        """
+        Imports an iterable of normalized patient dicts (add_patient's arguments plus an optional "ref",
+        the patient's id in the source system), one transaction per batch. A patient whose folded name and
+        birthday already exist is not inserted again; its ref still points to the existing patient, so
+        import_appointments() called afterwards from the same thread attaches visits to it.
+        progress_callback(stats) runs after every batch. Returns the stats dict, or None on error.
+        """
+        stats = {"read": 0, "inserted": 0, "duplicates": 0}
+        inserted = []  # (id, search_key) pacijenata iz tekuće grupe, za indeks imena posle commit-a
+        try:
+            conn = self._get_connection()
+            conn.execute(IMPORT_REF_TABLE_SQL)
+            conn.execute("DELETE FROM import_patient_ref")
+            conn.commit()
+            patients = iter(patients)
+            while True:
+                batch = list(itertools.islice(patients, batch_size))
+                if not batch:
+                    break
+                with conn:
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    for p in batch:
+                        search_key = fold_text(f"{p['name']} {p['last_name']}")
+                        cursor.execute(
+                            "SELECT id FROM patient WHERE search_key = ? AND birthday = ?",
+                            (search_key, p["birthday"])
+                        )
+                        row = cursor.fetchone()
+                        if row is not None:
+                            patient_id = row[0]
+                            stats["duplicates"] += 1
+                        else:
+                            cursor.execute(
+                                "INSERT INTO patient (name, last_name, phone_number, email, gender, birthday, address, "
+                                "note) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                (p["name"], p["last_name"], p.get("phone_number"), p.get("email"), p.get("gender"),
+                                 p["birthday"], p.get("address"), p.get("note"))
+                            )
+                            patient_id = cursor.lastrowid
+                            inserted.append((patient_id, search_key))
+                            stats["inserted"] += 1
+                        if p.get("ref") is not None:
+                            cursor.execute(
+                                "INSERT OR REPLACE INTO import_patient_ref (ref, patient_id) VALUES (?, ?)",
+                                (str(p["ref"]), patient_id)
+                            )
+                for patient_id, search_key in inserted:
+                    self._name_index.add(patient_id, search_key)
+                inserted.clear()
+                stats["read"] += len(batch)
+                if progress_callback:
+                    progress_callback(dict(stats))
+        except (sqlite3.Error, KeyError) as e:
+            log_error(f"Patient import failed after {stats['read']} rows: {e}")
+            return None
+        return stats
+
     def update_patient(self, patient_id, name, last_name, birthday, phone_number=None, email=None, gender=None,
                        address=None, note=None):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "UPDATE patient SET name = ?, last_name = ?, full_name = ?, phone_number = ?, email = ?, "
+                    "UPDATE patient SET name = ?, last_name = ?, phone_number = ?, email = ?, "
                     "gender = ?, birthday = ?, address = ?, note = ? WHERE id = ?",
-                    (name, last_name, f"{name} {last_name}", phone_number, email, gender, birthday, address, note,
-                     patient_id)
+                    (name, last_name, phone_number, email, gender, birthday, address, note, patient_id)
                 )
                 conn.commit()
+                self.invalidate_patient(patient_id)
+                if cursor.rowcount > 0:
+                    self._name_index.add(patient_id, fold_text(f"{name} {last_name}"))
                 return cursor.rowcount > 0
         except sqlite3.Error as e:
             log_error(f"Update patient failed: {e}")
@@ -104,70 +1159,324 @@ class DatabaseManager:
     def delete_patient(self, patient_id):
         try:
             self.backup_db()
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT diagnose_sound FROM appointment WHERE id_patient = ?", (patient_id,))
-                for row in cursor.fetchall():
-                    if row[0]:
-                        try:
-                            os.remove(row[0])
-                        except OSError:
-                            pass
-                cursor.execute("DELETE FROM appointment WHERE id_patient = ?", (patient_id,))
+                # Pregledi u glavnoj bazi se brišu kaskadno; arhiva je druga baza, do nje strani ključ ne dopire.
+                # Zvučne zapise trigeri stavljaju u audio_cleanup, a fajlove briše pozadinska nit.
+                cursor.execute("DELETE FROM archive.appointment WHERE id_patient = ?", (patient_id,))
                 cursor.execute("DELETE FROM patient WHERE id = ?", (patient_id,))
                 conn.commit()
+                self.invalidate_patient(patient_id)
+                self._name_index.remove(patient_id)
+                self._janitor_wakeup.set()
                 return cursor.rowcount > 0
         except sqlite3.Error as e:
             log_error(f"Delete patient failed: {e}")
             return False
 
     def get_patient(self, patient_id):
+        """Returns the full Patient record, from the LRU cache when it was read recently."""
+        with self._patient_cache_lock:
+            patient = self._patient_cache.get(patient_id)
+            if patient is not None:
+                self._patient_cache.move_to_end(patient_id)
+                self.patient_cache_hits += 1
+                return patient
+            self.patient_cache_misses += 1
+            generation = self._patient_cache_generation
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT * FROM patient WHERE id = ?", (patient_id,))
-                return cursor.fetchone()
+                cursor.row_factory = Patient.row_factory
+                cursor.execute(f"SELECT {PATIENT_COLUMNS} FROM patient WHERE id = ?", (patient_id,))
+                patient = cursor.fetchone()
         except sqlite3.Error as e:
             log_error(f"Get patient failed: {e}")
             return None
+        with self._patient_cache_lock:
+            # Ako je u međuvremenu neki upis poništio keš, pročitani red je možda zastareo
+            if patient is not None and generation == self._patient_cache_generation:
+                self._patient_cache[patient_id] = patient
+                if len(self._patient_cache) > PATIENT_CACHE_SIZE:
+                    self._patient_cache.popitem(last=False)
+        return patient
+
+    def invalidate_patient(self, patient_id=None):
+        """Drops one patient from the cache, or all of them when patient_id is None."""
+        with self._patient_cache_lock:
+            self._patient_cache_generation += 1
+            if patient_id is None:
+                self._patient_cache.clear()
+            else:
+                self._patient_cache.pop(patient_id, None)
+
+    def patient_cache_stats(self):
+        with self._patient_cache_lock:
+            return {
+                "hits": self.patient_cache_hits,
+                "misses": self.patient_cache_misses,
+                "size": len(self._patient_cache),
+                "capacity": PATIENT_CACHE_SIZE,
+            }
 
     def get_all_patients(self):
+        """Returns every patient with the list columns only (id, full_name, birthday)."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT id, name, last_name, full_name, phone_number, email, gender, birthday, address, note FROM patient")
+                cursor.row_factory = Patient.row_factory
+                cursor.execute(f"SELECT {PATIENT_LIST_COLUMNS} FROM patient")
                 return cursor.fetchall()
         except sqlite3.Error as e:
             log_error(f"Get all patients failed: {e}")
             return []
 
-    def search_patients(self, query):
+    def iter_patients(self, after_key=None, page_size=200, order_by="full_name"):
+        """
+        Yields pages (lists) of list-column Patient records using keyset pagination, so every page
+        is one index seek.
+        order_by is "full_name" (key: (full_name, id)) or "id" (key: id). after_key resumes after
+        the given key, e.g. the key of the last row of a previously shown page.
+        """
+        if order_by not in ("full_name", "id"):
+            raise ValueError(f"Unsupported order_by: {order_by}")
+        columns = PATIENT_LIST_COLUMNS
+        key = after_key
+        while True:
+            try:
+                with self._get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.row_factory = Patient.row_factory
+                    if order_by == "id":
+                        cursor.execute(
+                            f"SELECT {columns} FROM patient WHERE id > ? ORDER BY id LIMIT ?",
+                            (key if key is not None else -1, page_size)
+                        )
+                    elif key is None:
+                        cursor.execute(f"SELECT {columns} FROM patient ORDER BY full_name, id LIMIT ?", (page_size,))
+                    else:
+                        cursor.execute(
+                            f"SELECT {columns} FROM patient WHERE (full_name, id) > (?, ?) "
+                            "ORDER BY full_name, id LIMIT ?",
+                            (key[0], key[1], page_size)
+                        )
+                    page = cursor.fetchall()
+            except sqlite3.Error as e:
+                log_error(f"Iterate patients failed: {e}")
+                return
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+            key = last.id if order_by == "id" else (last.full_name, last.id)
+
+    def search_patients(self, query, mode="text"):
+        """
+        mode "text": full-text search over names, phone, email, address and note, best match first.
+        Dates, birth years and phone numbers in the query ("petrović 1978", "063 42", "15.03.1980") are looked
+        up through idx_patient_birthday and idx_patient_phone_key instead and intersected with the
+        remaining words; those results are sorted by name (see parse_patient_query).
+        mode "phonetic": sound-alike name lookup through idx_patient_phonetic_key, e.g. "Djordjevich" or
+        "Dzordzevic" finds "Đorđević"; words may come in either order.
+        """
+        if mode not in ("text", "phonetic"):
+            raise ValueError(f"Unsupported search mode: {mode}")
+        if mode == "phonetic":
+            return self._search_patients_phonetic(query)
+        terms = self.parse_patient_query(query)
+        if any(kind in ("date", "month", "year", "phone") for kind, _ in terms):
+            return self._search_patients_structured(terms)
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            match = self._patient_fts_query(query)
+            if not match:
+                return []
+            with self._get_connection() as conn:
                 cursor = conn.cursor( )
+                cursor.row_factory = Patient.row_factory
+                results = []
                 # Check if query is numeric for ID search
                 if query.isdigit( ):
-                    cursor.execute(
-                        "SELECT * FROM patient WHERE id = ? OR full_name LIKE ? LIMIT 100",
-                        (int(query), f"%{query}%")
-                    )
-                else:
-                    # Only search by name if query is non-numeric
-                    cursor.execute(
-                        "SELECT * FROM patient WHERE full_name LIKE ? LIMIT 100",
-                        (f"%{query}%",)
-                    )
-                return cursor.fetchall( )
+                    cursor.execute(f"SELECT {PATIENT_LIST_COLUMNS} FROM patient WHERE id = ?", (int(query),))
+                    results.extend(cursor.fetchall( ))
+                # bm25 težine po kolonama: ime je najvažnije, napomena najmanje. Rangiraju se svi pogoci,
+                # inače prefiks koji se poklapa sa mnogo napomena ili adresa potisne traženo ime iz liste
+                cursor.execute(
+                    f"SELECT {PATIENT_LIST_COLUMNS} FROM ("
+                    "    SELECT rowid, bm25(patient_fts, 10.0, 5.0, 3.0, 2.0, 1.0) AS score FROM patient_fts "
+                    "    WHERE patient_fts MATCH ? ORDER BY score LIMIT ?"
+                    ") f JOIN patient p ON p.id = f.rowid "
+                    "ORDER BY f.score",
+                    (match, SEARCH_RESULT_LIMIT)
+                )
+                found_ids = {patient.id for patient in results}
+                results.extend(patient for patient in cursor.fetchall( ) if patient.id not in found_ids)
+                return results[:SEARCH_RESULT_LIMIT]
         except sqlite3.Error as e:
+            if _interrupted(e):
+                raise  # otkazan zahtev nije greška; DatabaseWorker ga odbacuje bez upisa u log
             log_error(f"Search patients failed: {e}")
             return []
         except ValueError as e:
             log_error(f"Invalid query format: {e}")
             return []
 
+    def _search_patients_structured(self, terms):
+        conditions = []
+        params = []
+        fts = "id IN (SELECT rowid FROM patient_fts WHERE patient_fts MATCH ?)"
+        for kind, value in terms:
+            if kind == "date":
+                conditions.append("birthday = ?")
+                params.append(value)
+            elif kind == "month":
+                conditions.append("birthday >= ? AND birthday < ?")
+                params.extend(value)
+            elif kind == "year":
+                # Četiri cifre mogu biti i broj kartona
+                conditions.append("(birthday >= ? AND birthday < ? OR id = ?)")
+                params.extend((f"{value:04d}-01-01", f"{value + 1:04d}-01-01", value))
+            elif kind == "phone":
+                conditions.append("phone_key >= ? AND phone_key < ?")
+                params.extend((value, value + "\U0010ffff"))
+            elif kind == "number":
+                conditions.append(f"(id = ? OR {fts})")
+                params.extend((value, self._patient_fts_query(str(value))))
+        words = " ".join(value for kind, value in terms if kind == "text")
+        match = self._patient_fts_query(words)
+        if match:
+            conditions.append(fts)
+            params.append(match)
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Patient.row_factory
+                # Uslovi se seku u jednom upitu; "+full_name" sprečava da planer zbog ORDER BY ... LIMIT
+                # prođe ceo idx_full_name umesto da krene od indeksa datuma, telefona ili FTS-a
+                cursor.execute(
+                    f"SELECT {PATIENT_LIST_COLUMNS} FROM patient WHERE {' AND '.join(conditions)} "
+                    "ORDER BY +full_name, id LIMIT ?",
+                    params + [SEARCH_RESULT_LIMIT]
+                )
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            if _interrupted(e):
+                raise
+            log_error(f"Structured search patients failed: {e}")
+            return []
+
+    def _search_patients_phonetic(self, query):
+        words = (phonetic_key(query) or "").split()
+        if not words:
+            return []
+        # Ključ je "prezime ime"; upit se traži kao prefiks ključa i obrnutim i zadatim redom reči
+        prefixes = list(dict.fromkeys([" ".join(reversed(words)), " ".join(words)]))
+        conditions = " OR ".join("(phonetic_key >= ? AND phonetic_key < ?)" for _ in prefixes)
+        params = [bound for prefix in prefixes for bound in (prefix, prefix + "\U0010ffff")]
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Patient.row_factory
+                cursor.execute(
+                    f"SELECT {PATIENT_LIST_COLUMNS} FROM patient WHERE {conditions} "
+                    "ORDER BY phonetic_key, id LIMIT ?",
+                    params + [SEARCH_RESULT_LIMIT]
+                )
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            if _interrupted(e):
+                raise
+            log_error(f"Phonetic search patients failed: {e}")
+            return []
+
+    def get_patient_search_documents(self, patient_ids):
+        """
+        Returns {patient id: document} with the words patient_fts indexes for each patient, for
+        patient_matches_query. Unknown ids are left out.
+        """
+        patient_ids = list(patient_ids)
+        if not patient_ids:
+            return {}
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT id, search_key, address_key, note_key, phone_number, email FROM patient "
+                    f"WHERE id IN ({', '.join('?' * len(patient_ids))})",
+                    patient_ids
+                )
+                return {
+                    row[0]: (tuple(self._fts_tokens(" ".join(filter(None, row[1:4])))),
+                             tuple(self._fts_tokens(" ".join(filter(None, row[4:6])))))
+                    for row in cursor.fetchall()
+                }
+        except sqlite3.Error as e:
+            if _interrupted(e):
+                raise
+            log_error(f"Get patient search documents failed: {e}")
+            return {}
+
+    def load_name_index(self):
+        """
+        (Re)builds the in-memory trigram index of patient names from patient.search_key. Safe to run on a
+        background thread while patients are added or edited. Returns False if the database read failed.
+        """
+        with self._name_index_lock:
+            return self._load_name_index()
+
+    def _load_name_index(self):
+        conn = self._get_connection()
+
+        def rows():
+            # Upit kreće tek kada ga load() zatraži, pa izmene iz drugih niti ne promaknu indeksu
+            yield from conn.execute("SELECT id, search_key FROM patient")
+
+        try:
+            self._name_index.load(rows())
+            return True
+        except sqlite3.Error as e:
+            if _interrupted(e):
+                raise
+            log_error(f"Loading name index failed: {e}")
+            return False
+
+    def fuzzy_search_patients(self, query, limit=20):
+        """
+        Typo-tolerant name lookup through the trigram index ("Jovnović" finds "Jovanović"), best match
+        first. Meant as a fallback when search_patients finds nothing; loads the index on first use.
+        """
+        if not self._name_index.loaded:
+            # Ako ga pozadinska nit upravo puni, sačekaj nju umesto drugog punjenja
+            with self._name_index_lock:
+                if not self._name_index.loaded and not self._load_name_index():
+                    return []
+        ranked = self._name_index.search(fold_text(query), limit)
+        if not ranked:
+            return []
+        ids = [patient_id for patient_id, _ in ranked]
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Patient.row_factory
+                cursor.execute(
+                    f"SELECT {PATIENT_LIST_COLUMNS} FROM patient WHERE id IN ({', '.join('?' * len(ids))})", ids
+                )
+                found = {patient.id: patient for patient in cursor.fetchall()}
+        except sqlite3.Error as e:
+            if _interrupted(e):
+                raise
+            log_error(f"Fuzzy search patients failed: {e}")
+            return []
+        return [found[patient_id] for patient_id in ids if patient_id in found]
+
+    def name_index_stats(self):
+        """Size and approximate memory use of the trigram name index (see name_index.TrigramIndex.stats)."""
+        return self._name_index.stats()
+
     def add_appointment(self, id_patient, date, diagnose_text=None, diagnose_sound=None):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     "INSERT INTO appointment (id_patient, date, diagnose_text, diagnose_sound) "
@@ -180,15 +1489,107 @@ class DatabaseManager:
             log_error(f"Add appointment failed: {e}")
             return None
 
+    def add_appointments_bulk(self, appointments, batch_size=1000, defer_fts=False, defer_indexes=False):
+        """Inserts an iterable of appointment dicts (same keys as add_appointment's arguments); see add_patients_bulk."""
+        rows = (
+            (a["id_patient"], a["date"], a.get("diagnose_text"), a.get("diagnose_sound"))
+            for a in appointments
+        )
+        return self._bulk_write(
+            "INSERT INTO appointment (id_patient, date, diagnose_text, diagnose_sound) VALUES (?, ?, ?, ?)",
+            rows, "appointment", batch_size, defer_fts, defer_indexes
+        )
+
+    def update_appointments_bulk(self, appointments, batch_size=1000, defer_fts=False, defer_indexes=False):
+        """
+        Updates an iterable of appointment dicts with an "appointment_id" key plus the fields of
+        update_appointment, in one transaction; see add_patients_bulk. Archived appointments are updated in
+        the archive, like update_appointment does; ids found in neither are left out of "changed".
+        """
+        rows = (
+            (a["id_patient"], a["date"], a.get("diagnose_text"), a.get("diagnose_sound"), a["appointment_id"])
+            for a in appointments
+        )
+        # Id postoji ili u glavnoj bazi ili u arhivi, pa svaki red menja najviše jedna od dve naredbe
+        return self._bulk_write(
+            tuple(
+                f"UPDATE {schema}.appointment SET id_patient = ?, date = ?, diagnose_text = ?, diagnose_sound = ? "
+                "WHERE id = ?"
+                for schema in ("main", "archive")
+            ),
+            rows, "appointment", batch_size, defer_fts, defer_indexes
+        )
+
+    def import_appointments(self, appointments, batch_size=1000, progress_callback=None):
+        """
+        Imports an iterable of appointment dicts with "date", "diagnose_text" and either "patient_ref" (a ref
+        from import_patients() on this thread) or "name", "last_name" and "birthday" of an existing patient.
+        Visits already stored for the patient with the same date and text are skipped. Returns
+        {"read", "inserted", "duplicates", "unmatched"}, or None on error.
+        """
+        stats = {"read": 0, "inserted": 0, "duplicates": 0, "unmatched": 0}
+        try:
+            conn = self._get_connection()
+            conn.execute(IMPORT_REF_TABLE_SQL)
+            appointments = iter(appointments)
+            while True:
+                batch = list(itertools.islice(appointments, batch_size))
+                if not batch:
+                    break
+                with conn:
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    for a in batch:
+                        if a.get("patient_ref") is not None:
+                            cursor.execute(
+                                "SELECT patient_id FROM import_patient_ref WHERE ref = ?", (str(a["patient_ref"]),)
+                            )
+                        else:
+                            cursor.execute(
+                                "SELECT id FROM patient WHERE search_key = ? AND birthday = ?",
+                                (fold_text(f"{a['name']} {a['last_name']}"), a["birthday"])
+                            )
+                        row = cursor.fetchone()
+                        if row is None:
+                            stats["unmatched"] += 1
+                            continue
+                        cursor.execute(
+                            "SELECT 1 FROM appointment_all WHERE id_patient = ? AND date = ? AND diagnose_text IS ?",
+                            (row[0], a["date"], a.get("diagnose_text"))
+                        )
+                        if cursor.fetchone() is not None:
+                            stats["duplicates"] += 1
+                            continue
+                        cursor.execute(
+                            "INSERT INTO appointment (id_patient, date, diagnose_text) VALUES (?, ?, ?)",
+                            (row[0], a["date"], a.get("diagnose_text"))
+                        )
+                        stats["inserted"] += 1
+                stats["read"] += len(batch)
+                if progress_callback:
+                    progress_callback(dict(stats))
+        except (sqlite3.Error, KeyError) as e:
+            log_error(f"Appointment import failed after {stats['read']} rows: {e}")
+            return None
+        return stats
+
     def update_appointment(self, appointment_id, id_patient, date, diagnose_text=None, diagnose_sound=None):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
+                params = (id_patient, date, diagnose_text, diagnose_sound, appointment_id)
                 cursor.execute(
-                    "UPDATE appointment SET id_patient = ?, date = ?, diagnose_text = ?, diagnose_sound = ? "
+                    "UPDATE main.appointment SET id_patient = ?, date = ?, diagnose_text = ?, diagnose_sound = ? "
                     "WHERE id = ?",
-                    (id_patient, date, diagnose_text, diagnose_sound, appointment_id)
+                    params
                 )
+                if cursor.rowcount == 0:
+                    # Arhivirani pregled se menja na mestu, u arhivi
+                    cursor.execute(
+                        "UPDATE archive.appointment SET id_patient = ?, date = ?, diagnose_text = ?, "
+                        "diagnose_sound = ? WHERE id = ?",
+                        params
+                    )
                 conn.commit()
                 return cursor.rowcount > 0
         except sqlite3.Error as e:
@@ -198,27 +1599,123 @@ class DatabaseManager:
     def delete_appointment(self, appointment_id):
         try:
             self.backup_db()
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT diagnose_sound FROM appointment WHERE id = ?", (appointment_id,))
-                row = cursor.fetchone()
-                if row and row[0]:
-                    try:
-                        os.remove(row[0])
-                    except OSError:
-                        pass
-                cursor.execute("DELETE FROM appointment WHERE id = ?", (appointment_id,))
+                cursor.execute("DELETE FROM main.appointment WHERE id = ?", (appointment_id,))
+                deleted = cursor.rowcount
+                cursor.execute("DELETE FROM archive.appointment WHERE id = ?", (appointment_id,))
+                deleted += cursor.rowcount
                 conn.commit()
-                return cursor.rowcount > 0
+                self._janitor_wakeup.set()
+                return deleted > 0
         except sqlite3.Error as e:
             log_error(f"Delete appointment failed: {e}")
             return False
 
+    def archive_appointments(self, before_date, batch_size=ARCHIVE_BATCH_SIZE, stop_event=None):
+        """
+        Moves appointments dated before `before_date` into archive.db, batch by batch. Each batch is first
+        copied into the archive and committed, then deleted from the main database, so an interrupted run
+        never loses rows. A row edited between the two steps is deleted only from the archive and stays in
+        the main database until the next batch copies it again, so the edit is kept. Setting stop_event stops
+        after the current batch. Returns the number of moved appointments, or None on error.
+        """
+        moved = 0
+        try:
+            cutoff = self._day_range(before_date)[0]
+            conn = self._get_connection()
+            while True:
+                if stop_event is not None and (stop_event.is_set() or stop_event.wait(ARCHIVE_BATCH_PAUSE)):
+                    break
+                ids = [row[0] for row in conn.execute(
+                    "SELECT id FROM main.appointment WHERE date < ? ORDER BY date LIMIT ?", (cutoff, batch_size)
+                )]
+                if not ids:
+                    break
+                placeholders = ", ".join("?" * len(ids))
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    # Red koji je već u arhivi (prekinuto premeštanje) se ažurira, da bi trigeri za FTS
+                    # i brojače po danima videli izmenu umesto tihe zamene reda
+                    conn.execute(
+                        "INSERT INTO archive.appointment (id, id_patient, date, diagnose_text, diagnose_sound) "
+                        "SELECT id, id_patient, date, diagnose_text, diagnose_sound FROM main.appointment "
+                        f"WHERE id IN ({placeholders}) "
+                        "ON CONFLICT (id) DO UPDATE SET id_patient = excluded.id_patient, date = excluded.date, "
+                        "diagnose_text = excluded.diagnose_text, diagnose_sound = excluded.diagnose_sound",
+                        ids
+                    )
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    # Briše se samo red jednak svojoj kopiji u arhivi; pregled izmenjen između dve transakcije
+                    # ostaje u glavnoj bazi, a njegova zastarela kopija se briše iz arhive
+                    moved += conn.execute(
+                        f"DELETE FROM main.appointment WHERE id IN ({placeholders}) AND EXISTS ("
+                        "    SELECT 1 FROM archive.appointment a WHERE a.id = main.appointment.id "
+                        "    AND a.id_patient = main.appointment.id_patient AND a.date = main.appointment.date "
+                        "    AND a.diagnose_text IS main.appointment.diagnose_text "
+                        "    AND a.diagnose_sound IS main.appointment.diagnose_sound"
+                        ")",
+                        ids
+                    ).rowcount
+                    conn.execute(
+                        f"DELETE FROM archive.appointment WHERE id IN ({placeholders}) "
+                        "AND id IN (SELECT id FROM main.appointment)",
+                        ids
+                    )
+                    # Trigeri su zvučne zapise obrisanih redova stavili u red za brisanje, a preostali red ih i dalje koristi
+                    for schema in ("main", "archive"):
+                        conn.execute(
+                            f"DELETE FROM {schema}.audio_cleanup WHERE path IN (SELECT diagnose_sound FROM appointment_all "
+                            f"WHERE id IN ({placeholders}))",
+                            ids
+                        )
+        except ValueError as e:
+            log_error(f"Invalid archive date: {e}")
+            return None
+        except sqlite3.Error as e:
+            log_error(f"Archiving appointments failed after {moved} rows: {e}")
+            return None
+        if moved:
+            # Arhiva se menja samo ovde, pa se i njena rezerva pravi samo posle premeštanja
+            self.backups.start_backup(source_path=self.archive_path, prefix=ARCHIVE_BACKUP_PREFIX)
+        return moved
+
+    def archive_old_appointments(self, stop_event=None):
+        """Archives appointments older than the configured "archive_after_days". Does nothing when it is not set."""
+        if not self.archive_after_days:
+            return 0
+        before_date = datetime.date.today() - datetime.timedelta(days=int(self.archive_after_days))
+        return self.archive_appointments(before_date, stop_event=stop_event)
+
+    def start_archiving(self):
+        """
+        Runs archive_old_appointments() on its own background thread, after the schema tasks, so the first
+        start on a database with years of visits does not hold up the GUI's requests; close() stops it.
+        """
+        if self._archive_thread is not None or not self.archive_after_days:
+            return
+        schema_thread = self._schema_thread
+
+        def run():
+            try:
+                # Zadaci migracije drže zaključan upis; arhiviranje bi u međuvremenu samo čekalo
+                if schema_thread is not None:
+                    schema_thread.join()
+                if not self._archive_stop.is_set():
+                    self.archive_old_appointments(self._archive_stop)
+            finally:
+                self.release_connection()
+
+        self._archive_thread = threading.Thread(target=run, name="db-archive", daemon=True)
+        self._archive_thread.start()
+
     def get_appointment(self, appointment_id):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT * FROM appointment WHERE id = ?", (appointment_id,))
+                cursor.row_factory = Appointment.row_factory
+                cursor.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointment_all WHERE id = ?", (appointment_id,))
                 return cursor.fetchone()
         except sqlite3.Error as e:
             log_error(f"Get appointment failed: {e}")
@@ -226,9 +1723,10 @@ class DatabaseManager:
 
     def get_all_appointments(self):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT id, id_patient, date, diagnose_text FROM appointment")
+                cursor.row_factory = Appointment.row_factory
+                cursor.execute("SELECT id, id_patient, date, diagnose_text FROM appointment_all")
                 return cursor.fetchall()
         except sqlite3.Error as e:
             log_error(f"Get all appointments failed: {e}")
@@ -236,10 +1734,11 @@ class DatabaseManager:
 
     def get_appointments_by_patient_id(self, patient_id):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = Appointment.row_factory
                 cursor.execute(
-                    "SELECT id, date, diagnose_text FROM appointment WHERE id_patient = ? ORDER BY date DESC",
+                    f"SELECT {APPOINTMENT_LIST_COLUMNS} FROM appointment_all WHERE id_patient = ? ORDER BY date DESC",
                     (patient_id,)
                 )
                 return cursor.fetchall()
@@ -247,12 +1746,182 @@ class DatabaseManager:
             log_error(f"Get appointments by patient ID failed: {e}")
             return []
 
+    def search_appointments(self, query, limit=50, offset=0):
+        """
+        Full-text search over diagnoses.
+        The newest APPOINTMENT_RANK_WINDOW matches come first, ordered by bm25; older matches follow
+        from newest to oldest, archived appointments last. Returns (appointment_id, date, patient_id, full_name, snippet) rows;
+        matched words in the snippet are wrapped in SNIPPET_START / SNIPPET_END.
+        """
+        try:
+            match = self._fts_prefix_query(query)
+            if not match:
+                return []
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                ids = []
+                if offset < APPOINTMENT_RANK_WINDOW:
+                    cursor.execute("""
+                        SELECT rowid FROM (
+                            SELECT rowid, bm25(appointment_fts) AS score FROM main.appointment_fts
+                            WHERE appointment_fts MATCH ? ORDER BY rowid DESC LIMIT ?
+                        ) ORDER BY score LIMIT ? OFFSET ?
+                    """, (match, APPOINTMENT_RANK_WINDOW, min(limit, APPOINTMENT_RANK_WINDOW - offset), offset))
+                    ids = [row[0] for row in cursor.fetchall()]
+                if len(ids) < limit:
+                    # Stariji pogoci van rangiranog prozora, od najnovijeg ka najstarijem
+                    cursor.execute(
+                        "SELECT rowid FROM main.appointment_fts WHERE appointment_fts MATCH ? "
+                        "ORDER BY rowid DESC LIMIT ? OFFSET ?",
+                        (match, limit - len(ids), max(offset, APPOINTMENT_RANK_WINDOW))
+                    )
+                    ids.extend(row[0] for row in cursor.fetchall())
+                if len(ids) < limit:
+                    # Aktivni pogoci su iscrpljeni; slede arhivirani, takođe od najnovijeg
+                    cursor.execute("SELECT COUNT(*) FROM main.appointment_fts WHERE appointment_fts MATCH ?", (match,))
+                    hot_total = cursor.fetchone()[0]
+                    cursor.execute(
+                        "SELECT rowid FROM archive.appointment_fts WHERE appointment_fts MATCH ? "
+                        "ORDER BY rowid DESC LIMIT ? OFFSET ?",
+                        (match, limit - len(ids), max(0, offset + len(ids) - hot_total))
+                    )
+                    seen = set(ids)
+                    ids.extend(row[0] for row in cursor.fetchall() if row[0] not in seen)
+                if not ids:
+                    return []
+
+                placeholders = ", ".join("?" * len(ids))
+                cursor.execute(
+                    "SELECT a.id, a.date, p.id, p.full_name, a.diagnose_text FROM appointment_all a "
+                    f"JOIN patient p ON p.id = a.id_patient WHERE a.id IN ({placeholders})",
+                    ids
+                )
+                rows = {row[0]: row for row in cursor.fetchall()}
+                tokens = re.findall(r"\w+", query)
+                return [
+                    (appointment_id, date, patient_id, full_name, self._make_snippet(text, tokens))
+                    for appointment_id, date, patient_id, full_name, text in (rows[i] for i in ids if i in rows)
+                ]
+        except sqlite3.Error as e:
+            if _interrupted(e):
+                raise
+            log_error(f"Search appointments failed: {e}")
+            return []
+
+    def iter_appointments(self, patient_id, before_date=None, page_size=50, before_id=None):
+        """
+        Yields pages of Appointment records (id, date, diagnose_text) for one patient, newest first, using keyset
+        pagination over idx_appointment_patient_date. Pass the date (and id, for same-day visits)
+        of the last shown row to continue after it.
+        """
+        key = (before_date, before_id) if before_date is not None else None
+        while True:
+            try:
+                with self._get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.row_factory = Appointment.row_factory
+                    if key is None:
+                        cursor.execute(
+                            f"SELECT {APPOINTMENT_LIST_COLUMNS} FROM appointment_all WHERE id_patient = ? "
+                            "ORDER BY date DESC, id DESC LIMIT ?",
+                            (patient_id, page_size)
+                        )
+                    elif key[1] is None:
+                        cursor.execute(
+                            f"SELECT {APPOINTMENT_LIST_COLUMNS} FROM appointment_all WHERE id_patient = ? AND date < ? "
+                            "ORDER BY date DESC, id DESC LIMIT ?",
+                            (patient_id, key[0], page_size)
+                        )
+                    else:
+                        cursor.execute(
+                            f"SELECT {APPOINTMENT_LIST_COLUMNS} FROM appointment_all WHERE id_patient = ? "
+                            "AND (date, id) < (?, ?) ORDER BY date DESC, id DESC LIMIT ?",
+                            (patient_id, key[0], key[1], page_size)
+                        )
+                    page = cursor.fetchall()
+            except sqlite3.Error as e:
+                log_error(f"Iterate appointments failed: {e}")
+                return
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            key = (page[-1].date, page[-1].id)
+
+    def iter_export(self, batch_size=500):
+        """
+        Yields batches (lists) of (Patient, [Appointment, ...]) pairs covering the whole database, including
+        archived appointments, in patient id order; each patient's appointments are oldest first.
+        Everything is read in one read transaction, so the export is a consistent snapshot while the
+        application keeps writing. Consume it from one thread; closing the generator ends the transaction.
+        """
+        conn = self._get_connection()
+        patients = conn.cursor()
+        patients.row_factory = Patient.row_factory
+        appointments = conn.cursor()
+        appointments.row_factory = Appointment.row_factory
+        try:
+            conn.execute("BEGIN")
+            # Pacijenti se čitaju jednim kursorom, a izveštaji za ceo opseg id-jeva grupe jednim upitom
+            patients.execute(f"SELECT {PATIENT_COLUMNS} FROM patient ORDER BY id")
+            while True:
+                batch = patients.fetchmany(batch_size)
+                if not batch:
+                    break
+                by_patient = {patient.id: [] for patient in batch}
+                appointments.execute(
+                    f"SELECT {APPOINTMENT_COLUMNS} FROM appointment_all WHERE id_patient BETWEEN ? AND ? "
+                    "ORDER BY id_patient, date, id",
+                    (batch[0].id, batch[-1].id)
+                )
+                for appointment in appointments:
+                    # Izveštaji obrisanih pacijenata nemaju kome da pripadnu
+                    if appointment.id_patient in by_patient:
+                        by_patient[appointment.id_patient].append(appointment)
+                yield [(patient, by_patient[patient.id]) for patient in batch]
+        except sqlite3.Error as e:
+            log_error(f"Export read failed: {e}")
+            raise
+        finally:
+            patients.close()
+            appointments.close()
+            if conn.in_transaction:
+                conn.rollback()
+
+    def get_appointment_day_counts(self, year, month):
+        """
+        Returns {"YYYY-MM-DD": number of appointments} for the days of one month that have appointments,
+        archived ones included. Reads only appointment_day_stats, two primary key range seeks.
+        """
+        try:
+            month_start = datetime.date(year, month, 1)
+            month_end = (month_start + datetime.timedelta(days=31)).replace(day=1)
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT day, SUM(count) FROM ("
+                    "SELECT day, count FROM main.appointment_day_stats WHERE day >= ? AND day < ? "
+                    "UNION ALL "
+                    "SELECT day, count FROM archive.appointment_day_stats WHERE day >= ? AND day < ?"
+                    ") GROUP BY day",
+                    (month_start.isoformat(), month_end.isoformat()) * 2
+                )
+                return dict(cursor.fetchall())
+        except ValueError as e:
+            log_error(f"Invalid month: {e}")
+            return {}
+        except sqlite3.Error as e:
+            log_error(f"Get appointment day counts failed: {e}")
+            return {}
+
     def get_appointments_by_date(self, target_date):
         """
         Returns all appointments for a specific date with patient details.
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            day_start, day_end = self._day_range(target_date)
+            with self._get_connection() as conn:
                 cursor = conn.cursor( )
                 cursor.execute("""
                                SELECT appointment.id,
@@ -262,56 +1931,61 @@ class DatabaseManager:
                                       patient.full_name,
                                       patient.birthday,
                                       patient.address
-                               FROM appointment
+                               FROM appointment_all AS appointment
                                         JOIN patient ON appointment.id_patient = patient.id
-                               WHERE DATE (appointment.date) = DATE (?)
+                               WHERE appointment.date >= ? AND appointment.date < ?
                                ORDER BY appointment.date ASC
-                               """, (target_date,))
+                               """, (day_start, day_end))
                 return cursor.fetchall( )
+        except ValueError as e:
+            log_error(f"Invalid date format: {e}")
+            return []
         except sqlite3.Error as e:
             log_error(f"Get appointments by date failed: {e}")
             return []
 
     def get_patients_by_appointment_date(self, date):
         try:
-            # Osiguraj da je u formatu 'YYYY-MM-DD'
-            if isinstance(date, (datetime.date, datetime.datetime)):
-                date_str = date.strftime('%Y-%m-%d')
-            else:
-                date_str = str(date)
+            # Polu-otvoren opseg [dan, sledeći dan) koristi indeks na appointment.date
+            day_start, day_end = self._day_range(date)
 
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = Patient.row_factory
                 cursor.execute("""
-                       SELECT p.id, p.full_name, p.birthday, p.address, p.gender, p.note
-                       FROM appointment a
+                       SELECT p.id, p.full_name, p.birthday
+                       FROM appointment_all a
                        JOIN patient p ON a.id_patient = p.id
-                       WHERE DATE(a.date) = ?
+                       WHERE a.date >= ? AND a.date < ?
                        ORDER BY a.date ASC
-                   """, (date_str,))
+                   """, (day_start, day_end))
                 return cursor.fetchall()
+        except ValueError as e:
+            log_error(f"Invalid date format: {e}")
+            return []
         except sqlite3.Error as e:
             log_error(f"Get patients by appointment date failed: {e}")
             return []
 
     def get_patients_by_appointment_date_print_report(self, date):
         try:
-            # Osiguraj da je u formatu 'YYYY-MM-DD'
-            if isinstance(date, (datetime.date, datetime.datetime)):
-                date_str = date.strftime('%Y-%m-%d')
-            else:
-                date_str = str(date)
+            # Polu-otvoren opseg [dan, sledeći dan) koristi indeks na appointment.date
+            day_start, day_end = self._day_range(date)
 
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = Patient.row_factory
                 cursor.execute("""
-                       SELECT p.id, p.full_name, p.birthday, p.address, p.gender, p.note, p.phone_number
-                       FROM appointment a
+                       SELECT p.id, p.full_name, p.birthday, p.phone_number
+                       FROM appointment_all a
                        JOIN patient p ON a.id_patient = p.id
-                       WHERE DATE(a.date) = ?
+                       WHERE a.date >= ? AND a.date < ?
                        ORDER BY a.date ASC
-                   """, (date_str,))
+                   """, (day_start, day_end))
                 return cursor.fetchall()
+        except ValueError as e:
+            log_error(f"Invalid date format: {e}")
+            return []
         except sqlite3.Error as e:
             log_error(f"Get patients by appointment date failed: {e}")
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,125 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from utils import log_error
+
+
+class DatabaseWorker(QObject):
+    """
+    Runs DatabaseManager calls on one background thread so the GUI thread never waits on SQLite.
+
+    submit() returns a concurrent.futures.Future. Callbacks are delivered on the thread that owns
+    the worker (the GUI thread), through a queued Qt signal. Requests submitted with the same `key`
+    replace each other: an older request that has not started yet is cancelled, and one that is already
+    running is interrupted mid-query and dropped without an error log entry. DatabaseManager's search
+    methods let the "interrupted" error through instead of returning an empty result. Use keys only for reads.
+    """
+    task_finished = pyqtSignal(object, object, object)  # (task, result, error)
+
+    def __init__(self, db_manager):
+        super().__init__()
+        self.db_manager = db_manager
+        self._queue = queue.Queue()
+        self._latest = {}  # key -> Future poslednjeg zahteva sa tim ključem
+        self._current = None  # Future zahteva koji se upravo izvršava
+        self._current_interrupted = False
+        self._current_lock = threading.Lock()
+        self._connection = None  # konekcija pozadinske niti, za interrupt() iz GUI niti
+        self.task_finished.connect(self._deliver)
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, callback=None, error_callback=None, key=None, **kwargs):
+        future = Future()
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous.cancel()
+                self._interrupt(previous)
+            self._latest[key] = future
+        self._queue.put((future, func, args, kwargs, callback, error_callback, key))
+        return future
+
+    def cancel(self, key):
+        """Cancels the pending request for `key`, or interrupts it and drops its result if it is already running."""
+        future = self._latest.pop(key, None)
+        if future is not None:
+            future.cancel()
+            self._interrupt(future)
+
+    def _interrupt(self, future):
+        with self._current_lock:
+            if self._current is not future or self._connection is None:
+                return
+            # interrupt() prekida upit koji je u toku; zastavica zaustavlja i sledeće upite istog zahteva
+            self._current_interrupted = True
+            self._connection.interrupt()
+
+    def shutdown(self, timeout=5.0):
+        """Finishes queued requests, then stops the thread and closes its connection."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            self._connection = self.db_manager.connection()
+            self._connection.set_progress_handler(lambda: 1 if self._current_interrupted else 0, 1000)
+            while True:
+                task = self._queue.get()
+                if task is None:
+                    break
+                future, func, args, kwargs = task[:4]
+                if not future.set_running_or_notify_cancel():
+                    continue  # otkazan pre nego što je počeo
+                with self._current_lock:
+                    self._current = future
+                    self._current_interrupted = False
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    if not self._current_interrupted:
+                        log_error(f"Background database call {getattr(func, '__name__', func)} failed: {e}")
+                    future.set_exception(e)
+                    self.task_finished.emit(task, None, e)
+                else:
+                    future.set_result(result)
+                    self.task_finished.emit(task, result, None)
+                finally:
+                    with self._current_lock:
+                        self._current = None
+                        self._current_interrupted = False
+        finally:
+            with self._current_lock:
+                self._connection = None
+            self.db_manager.release_connection()
+
+    def _deliver(self, task, result, error):
+        future, _, _, _, callback, error_callback, key = task
+        if key is not None:
+            if self._latest.get(key) is not future:
+                return  # zastareo zahtev, noviji je već poslat
+            del self._latest[key]
+        if error is not None:
+            if error_callback:
+                error_callback(error)
+        elif callback:
+            callback(result)
+
+
+def submit_or_call(worker, func, *args, callback=None, error_callback=None, key=None, **kwargs):
+    """Submits to `worker` when there is one, otherwise runs the call right away and invokes the callbacks."""
+    if worker is not None:
+        return worker.submit(func, *args, callback=callback, error_callback=error_callback, key=key, **kwargs)
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        if error_callback is None:
+            raise
+        error_callback(e)
+        return None
+    if callback:
+        callback(result)
+    return None
@@ -0,0 +1,183 @@
+"""
+Streaming export of all patients with their appointments.
+
+Formats: NDJSON (one patient per line, appointments nested) or CSV (one row per appointment, patient
+columns repeated). With a .zip target the data file is packed together with the referenced audio files.
+Rows come from DatabaseManager.iter_export in fixed-size batches, so memory use does not depend on
+the database size. The CSV columns are ones importer.py recognizes.
+
+Usage: python exporter.py [--db PATH] [--format ndjson|csv] [--audio] [--batch-size N] target
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from utils import load_config, log_error
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+PATIENT_FIELDS = ("id", "name", "last_name", "phone_number", "email", "gender", "birthday", "address", "note")
+APPOINTMENT_FIELDS = ("id", "date", "diagnose_text", "diagnose_sound")
+CSV_HEADER = (["patient_id"] + list(PATIENT_FIELDS[1:]) +
+              ["appointment_id", "date", "diagnose_text", "diagnose_sound"])
+
+AUDIO_ARCHIVE_DIR = "audio"
+
+
+def audio_archive_name(appointment):
+    # id ispred imena, da se isti nazivi fajlova iz različitih foldera ne sudare u zip-u
+    return f"{AUDIO_ARCHIVE_DIR}/{appointment.id}_{os.path.basename(appointment.diagnose_sound)}"
+
+
+class _CountingWriter:
+    """Text sink that counts the UTF-8 bytes written through it."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_written = 0
+
+    def write(self, text):
+        self.bytes_written += len(text.encode("utf-8"))
+        return self.stream.write(text)
+
+
+def _write_ndjson(out, batch, sound_name):
+    for patient, appointments in batch:
+        record = {field: getattr(patient, field) for field in PATIENT_FIELDS}
+        record["appointments"] = [
+            dict({field: getattr(a, field) for field in APPOINTMENT_FIELDS}, diagnose_sound=sound_name(a))
+            for a in appointments
+        ]
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+
+
+def _write_csv(writer, batch, sound_name):
+    for patient, appointments in batch:
+        patient_row = [getattr(patient, field) for field in PATIENT_FIELDS]
+        if not appointments:
+            writer.writerow(patient_row + [None] * 4)
+        for a in appointments:
+            writer.writerow(patient_row + [a.id, a.date, a.diagnose_text, sound_name(a)])
+
+
+def export_database(db_manager, target, export_format="ndjson", include_audio=False, batch_size=500,
+                    progress_callback=None):
+    """
+    Writes the whole database to `target`. A target ending in .zip gets the data file plus, with
+    include_audio, every existing audio file under audio/; diagnose_sound then points into the zip.
+    progress_callback(stats) runs after every batch.
+    Returns {"patients", "appointments", "audio_files", "bytes", "seconds", "rows_per_second", "mb_per_second"}.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    as_zip = target.lower().endswith(".zip")
+    if include_audio and not as_zip:
+        raise ValueError("Audio files can only be exported into a .zip target")
+
+    stats = {"patients": 0, "appointments": 0, "audio_files": 0, "bytes": 0}
+    start = time.perf_counter()
+    tmp_path = target + ".tmp"
+    archive = zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) if as_zip else None
+    # U zip-u ne mogu dva unosa da budu otvorena za pisanje, pa se podaci pišu u privremeni fajl
+    # dok se audio fajlovi pakuju usput, a na kraju se i on prebaci u zip
+    raw = tempfile.TemporaryFile() if as_zip else open(tmp_path, "wb")
+    data = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    try:
+        out = _CountingWriter(data)
+        writer = None
+        if export_format == "csv":
+            writer = csv.writer(out)
+            writer.writerow(CSV_HEADER)
+
+        def sound_name(appointment):
+            if not appointment.diagnose_sound or not include_audio:
+                return appointment.diagnose_sound
+            if not os.path.isfile(appointment.diagnose_sound):
+                log_error(f"Export: missing audio file {appointment.diagnose_sound}")
+                return None
+            name = audio_archive_name(appointment)
+            archive.write(appointment.diagnose_sound, name)
+            stats["audio_files"] += 1
+            stats["bytes"] += os.path.getsize(appointment.diagnose_sound)
+            return name
+
+        batches = db_manager.iter_export(batch_size)
+        try:
+            for batch in batches:
+                if writer is not None:
+                    _write_csv(writer, batch, sound_name)
+                else:
+                    _write_ndjson(out, batch, sound_name)
+                stats["patients"] += len(batch)
+                stats["appointments"] += sum(len(appointments) for _, appointments in batch)
+                if progress_callback:
+                    progress_callback(dict(stats, bytes=stats["bytes"] + out.bytes_written))
+        finally:
+            batches.close()
+        stats["bytes"] += out.bytes_written
+
+        if archive is not None:
+            data.flush()
+            raw.seek(0)
+            with archive.open(f"patients.{export_format}", "w") as entry:
+                shutil.copyfileobj(raw, entry)
+            archive.close()
+            archive = None
+        data.close()
+        os.replace(tmp_path, target)
+    except BaseException:
+        if archive is not None:
+            archive.close()
+        data.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    elapsed = time.perf_counter() - start
+    rows = stats["patients"] + stats["appointments"]
+    stats["seconds"] = elapsed
+    stats["rows_per_second"] = rows / elapsed if elapsed > 0 else float(rows)
+    stats["mb_per_second"] = stats["bytes"] / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def main():
+    # Isti podrazumevani put kao u main.py
+    default_db = os.path.join(os.path.expandvars(r"%APPDATA%\DoctorApp"), "data", "database.db")
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("target", help="output file (.ndjson, .csv or .zip)")
+    parser.add_argument("--db", default=default_db)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="defaults to the target's extension, else ndjson")
+    parser.add_argument("--audio", action="store_true", help="pack audio files into the .zip target")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    export_format = args.format or ("csv" if args.target.lower().endswith(".csv") else "ndjson")
+    if args.audio and not args.target.lower().endswith(".zip"):
+        parser.error("--audio needs a .zip target")
+
+    from database_manager import DatabaseManager
+    db_manager = DatabaseManager(args.db, load_config().get("database"))
+
+    def progress(stats):
+        print(f"\rpatients: {stats['patients']}  appointments: {stats['appointments']}  "
+              f"{stats['bytes'] / 1024 / 1024:.1f} MB", end="", flush=True)
+
+    try:
+        stats = export_database(db_manager, args.target, export_format, args.audio, args.batch_size, progress)
+    finally:
+        db_manager.close()
+    print()
+    print(f"{stats['patients']} patients, {stats['appointments']} appointments, {stats['audio_files']} audio files")
+    print(f"{stats['seconds']:.1f} s, {stats['rows_per_second']:.0f} rows/s, {stats['mb_per_second']:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from PyQt6.QtWidgets import QGraphicsDropShadowEffect, QPushButton, QHBoxLayout,
     QVBoxLayout, QDialog, QWidget
 import os
 
+from db_worker import submit_or_call
 from report_generator import generate_appointment_pdf
 from speech_processor import SpeechProcessor
 
@@ -152,10 +153,11 @@ class SuccessDialog(QDialog):
         self.animation.start()
 
 class AddReportDialog(QDialog):
-    def __init__(self, patient_id, db_manager, refresh_callback=None, parent=None):
+    def __init__(self, patient_id, db_manager, refresh_callback=None, parent=None, db_worker=None):
         super().__init__(parent)
         self.patient_id = patient_id
         self.db_manager = db_manager
+        self.db_worker = db_worker
         self.refresh_callback = refresh_callback
         self.setWindowTitle("Dodaj izveštaj")
         self.resize(500, 550)
@@ -394,26 +396,36 @@ class AddReportDialog(QDialog):
             warning.exec()
             return
 
-        try:
-            appointment_id = self.db_manager.add_appointment(
-                id_patient=self.patient_id,
-                date=date_str,
-                diagnose_text=diagnose_text,
-                diagnose_sound=self.audio_path
-            )
-            if appointment_id:
-                if hasattr(self, "refresh_callback") and self.refresh_callback:
-                    self.refresh_callback(self.patient_id)
-                dialog = SuccessDialog("Uspešno ste dodali izveštaj!", self)
-                dialog.exec()
-                self.accept()
-            else:
-                warning = WarningDialog("Došlo je do greške pri dodavanju izveštaja.", self)
-                warning.exec()
-        except Exception as e:
-            warning = WarningDialog(f"Greška pri čuvanju izveštaja: {str(e)}", self)
+        # Upis ide u pozadinsku nit; dugme je isključeno dok ne stigne odgovor
+        self.save_btn.setEnabled(False)
+        submit_or_call(
+            self.db_worker,
+            self.db_manager.add_appointment,
+            id_patient=self.patient_id,
+            date=date_str,
+            diagnose_text=diagnose_text,
+            diagnose_sound=self.audio_path,
+            callback=self.on_report_saved,
+            error_callback=self.on_report_save_failed
+        )
+
+    def on_report_saved(self, appointment_id):
+        self.save_btn.setEnabled(True)
+        if appointment_id:
+            if hasattr(self, "refresh_callback") and self.refresh_callback:
+                self.refresh_callback(self.patient_id)
+            dialog = SuccessDialog("Uspešno ste dodali izveštaj!", self)
+            dialog.exec()
+            self.accept()
+        else:
+            warning = WarningDialog("Došlo je do greške pri dodavanju izveštaja.", self)
             warning.exec()
 
+    def on_report_save_failed(self, error):
+        self.save_btn.setEnabled(True)
+        warning = WarningDialog(f"Greška pri čuvanju izveštaja: {str(error)}", self)
+        warning.exec()
+
     def create_title_bar(self):
         title_bar = QWidget()
         title_bar.setFixedHeight(40)
@@ -461,23 +473,33 @@ class AddReportDialog(QDialog):
         widget.setGraphicsEffect(shadow)
 
     def print_pdf(self):
-        try:
-            diagnose_text = self.diagnose_input.toPlainText().strip()
-            if not diagnose_text:
-                warning = WarningDialog("Unesite dijagnozu pre štampe.", self)
-                warning.exec()
-                return
+        diagnose_text = self.diagnose_input.toPlainText().strip()
+        if not diagnose_text:
+            warning = WarningDialog("Unesite dijagnozu pre štampe.", self)
+            warning.exec()
+            return
 
-            patient = self.db_manager.get_patient(self.patient_id)
+        # Pacijent se čita u pozadini; štampa kreće kada stigne
+        self.print_btn.setEnabled(False)
+        submit_or_call(
+            self.db_worker,
+            self.db_manager.get_patient, self.patient_id,
+            callback=lambda patient: self.print_patient_pdf(patient, diagnose_text),
+            error_callback=self.on_print_failed
+        )
+
+    def print_patient_pdf(self, patient, diagnose_text):
+        self.print_btn.setEnabled(True)
+        try:
             if not patient:
                 warning = WarningDialog("Podaci o pacijentu nisu pronađeni.", self)
                 warning.exec()
                 return
 
             patient_data = {
-                "full_name": f"{patient[1]} {patient[2]}",
-                "birthday": patient[7],
-                "address": patient[8] or ""
+                "full_name": f"{patient.name} {patient.last_name}",
+                "birthday": patient.birthday,
+                "address": patient.address or ""
             }
 
             logo_path = resource_path("assets/icons/pdfLogo.png")
@@ -491,4 +513,9 @@ class AddReportDialog(QDialog):
             webbrowser.open(f"file:///{temp_path.replace(os.sep, '/')}")
         except Exception as e:
             warning = WarningDialog(f"Greška pri štampi: {str(e)}", self)
-            warning.exec()
\ No newline at end of file
+            warning.exec()
+
+    def on_print_failed(self, error):
+        self.print_btn.setEnabled(True)
+        warning = WarningDialog(f"Greška pri štampi: {str(error)}", self)
+        warning.exec()
\ No newline at end of file
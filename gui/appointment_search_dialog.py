@@ -0,0 +1,338 @@
+import html
+import os
+import sys
+
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QIcon, QPixmap, QFont
+from PyQt6.QtWidgets import QGraphicsDropShadowEffect, QPushButton, QHBoxLayout, QLabel, QLineEdit, \
+    QVBoxLayout, QDialog, QWidget, QListWidget, QAbstractItemView, QListWidgetItem, QFrame
+
+from database_manager import SNIPPET_START, SNIPPET_END
+from db_worker import submit_or_call
+
+
+def resource_path(relative_path):
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, relative_path)
+    return os.path.abspath(relative_path)
+
+
+class SearchResultCard(QFrame):
+    clicked = pyqtSignal()
+
+    def __init__(self, date: str, full_name: str, snippet: str):
+        super().__init__()
+        self.setObjectName("SearchResultCard")
+        self.selected = False
+        self.hovered = False
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.setAttribute(Qt.WidgetAttribute.WA_Hover)
+
+        shadow = QGraphicsDropShadowEffect(self)
+        shadow.setBlurRadius(16)
+        shadow.setOffset(0, 4)
+        shadow.setColor(QColor(0, 0, 0, 40))
+        self.setGraphicsEffect(shadow)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(16, 10, 16, 10)
+        layout.setSpacing(4)
+
+        self.title_label = QLabel(f"{full_name} — {date}")
+        self.title_label.setFont(QFont("Inter", 10, QFont.Weight.Bold))
+
+        # Tekst iz baze se escape-uje, a pogođene reči se podebljaju
+        snippet_html = html.escape(snippet or "").replace(SNIPPET_START, "<b>").replace(SNIPPET_END, "</b>")
+        self.snippet_label = QLabel(snippet_html)
+        self.snippet_label.setTextFormat(Qt.TextFormat.RichText)
+        self.snippet_label.setFont(QFont("Inter", 10))
+        self.snippet_label.setWordWrap(True)
+        self.snippet_label.setTextInteractionFlags(Qt.TextInteractionFlag.NoTextInteraction)
+
+        layout.addWidget(self.title_label)
+        layout.addWidget(self.snippet_label)
+
+        self.update_style()
+
+    def enterEvent(self, event):
+        self.hovered = True
+        self.update_style()
+
+    def leaveEvent(self, event):
+        self.hovered = False
+        self.update_style()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.clicked.emit()
+            super().mousePressEvent(event)
+
+    def set_selected(self, selected: bool):
+        self.selected = selected
+        self.update_style()
+
+    def update_style(self):
+        if self.selected or self.hovered:
+            bg_color = "#0C81E4"
+            text_color = "white"
+        else:
+            bg_color = "white"
+            text_color = "#111827"
+
+        self.setStyleSheet(f"""
+            QFrame#SearchResultCard {{
+                background-color: {bg_color};
+                border-radius: 12px;
+                border: none;
+            }}
+        """)
+        self.title_label.setStyleSheet(f"color: {text_color}; background-color: transparent;")
+        self.snippet_label.setStyleSheet(f"color: {text_color}; background-color: transparent;")
+
+
+class AppointmentSearchDialog(QDialog):
+    PAGE_SIZE = 50
+
+    def __init__(self, db_manager, parent=None, db_worker=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.db_worker = db_worker
+        self.loading = False
+        self.selected_patient_id = None
+        self.query = ""
+        self.results = []  # (appointment_id, date, patient_id, full_name, snippet)
+        self.cards = []
+        self.has_more = False
+
+        self.setWindowTitle("Pretraga izveštaja")
+        self.resize(600, 600)
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: white;
+                border: 1px solid #d1d5db;
+                border-radius: 12px;
+            }
+        """)
+
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.setSpacing(0)
+
+        main_layout.addWidget(self.create_title_bar())
+
+        content_layout = QVBoxLayout()
+        content_layout.setContentsMargins(24, 24, 24, 24)
+        content_layout.setSpacing(16)
+
+        # === Polje za pretragu ===
+        search_container = QWidget()
+        search_layout = QHBoxLayout(search_container)
+        search_layout.setContentsMargins(12, 4, 12, 4)
+        search_layout.setSpacing(8)
+        search_container.setStyleSheet("background-color: #f3f4f6; border-radius: 18px;")
+
+        icon_label = QLabel()
+        icon_label.setFixedSize(16, 16)
+        icon_label.setPixmap(QPixmap(resource_path("assets/icons/search.png")).scaled(16, 16))
+        icon_label.setStyleSheet("background-color: transparent;")
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Pretraži dijagnoze (Enter)")
+        self.search_input.setFont(QFont("Montserrat", 11, QFont.Weight.Medium))
+        self.search_input.setStyleSheet("border: none; background-color: transparent; font-size: 14px;")
+        self.search_input.returnPressed.connect(self.run_search)
+
+        search_layout.addWidget(icon_label)
+        search_layout.addWidget(self.search_input)
+        self.apply_shadow(search_container)
+        content_layout.addWidget(search_container)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #6B7280;")
+        content_layout.addWidget(self.status_label)
+
+        # === Rezultati ===
+        self.result_list = QListWidget()
+        self.result_list.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.result_list.verticalScrollBar().setSingleStep(10)
+        self.result_list.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        self.result_list.setSpacing(8)
+        self.result_list.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.result_list.setStyleSheet("""
+            QListWidget {
+                background-color: white;
+                border: none;
+                padding: 6px;
+            }
+            QListWidget::item {
+                background: transparent;
+                border: none;
+            }
+            QScrollBar:vertical {
+                background: transparent;
+                width: 6px;
+                margin: 2px 0 2px 0;
+                border-radius: 3px;
+            }
+            QScrollBar::handle:vertical {
+                background: #D1D5DB;
+                min-height: 20px;
+                border-radius: 3px;
+            }
+            QScrollBar::add-line:vertical,
+            QScrollBar::sub-line:vertical {
+                height: 0;
+            }
+        """)
+        content_layout.addWidget(self.result_list)
+
+        # === Dugmad ===
+        btn_layout = QHBoxLayout()
+        self.open_btn = QPushButton("Otvori karton")
+        self.open_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #0C81E4;
+                color: white;
+                font-weight: bold;
+                padding: 8px 20px;
+                border-radius: 24px;
+            }
+            QPushButton:hover {
+                background-color: #106FCC;
+            }
+        """)
+        self.open_btn.clicked.connect(self.open_selected)
+        self.apply_shadow(self.open_btn)
+
+        self.cancel_btn = QPushButton("Otkaži")
+        self.cancel_btn.setStyleSheet("""
+            QPushButton {
+                background-color: white;
+                font-weight: bold;
+                padding: 8px 20px;
+                border-radius: 24px;
+            }
+            QPushButton:hover {
+                background-color: #e5e7eb;
+            }
+        """)
+        self.cancel_btn.clicked.connect(self.reject)
+        self.apply_shadow(self.cancel_btn)
+
+        btn_layout.addWidget(self.open_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        content_layout.addLayout(btn_layout)
+
+        main_layout.addLayout(content_layout)
+
+    def run_search(self):
+        self.query = self.search_input.text().strip()
+        self.results = []
+        self.cards = []
+        self.result_list.clear()
+        self.selected_patient_id = None
+        self.has_more = bool(self.query)
+        self.loading = False
+        self.load_next_page()
+
+    def load_next_page(self):
+        if not self.has_more or self.loading:
+            return
+        self.loading = True
+        # Strana se traži u pozadini; nova pretraga istim ključem poništava zahtev za staru
+        submit_or_call(
+            self.db_worker,
+            self.db_manager.search_appointments, self.query, limit=self.PAGE_SIZE, offset=len(self.results),
+            key="appointment_search",
+            callback=self.on_page_loaded
+        )
+
+    def on_page_loaded(self, page):
+        self.loading = False
+        self.has_more = len(page) == self.PAGE_SIZE
+
+        for appointment_id, date, patient_id, full_name, snippet in page:
+            card = SearchResultCard(date, full_name, snippet)
+            card.clicked.connect(lambda c=card, pid=patient_id: self.select_card(c, pid))
+            self.cards.append(card)
+
+            item = QListWidgetItem()
+            item.setSizeHint(card.sizeHint())
+            item.setFlags(Qt.ItemFlag.ItemIsEnabled)
+            self.result_list.addItem(item)
+            self.result_list.setItemWidget(item, card)
+        self.results.extend(page)
+
+        if not self.results:
+            self.status_label.setText("Nema pronađenih izveštaja.")
+        else:
+            self.status_label.setText(f"Prikazano izveštaja: {len(self.results)}")
+
+    def on_scroll(self, value):
+        # Sledeća strana se učitava tek kada korisnik dođe do dna liste
+        if value >= self.result_list.verticalScrollBar().maximum():
+            self.load_next_page()
+
+    def select_card(self, selected_card, patient_id):
+        for card in self.cards:
+            card.set_selected(card is selected_card)
+        self.selected_patient_id = patient_id
+
+    def open_selected(self):
+        if self.selected_patient_id is not None:
+            self.accept()
+
+    def done(self, result):
+        # Strana koja stigne posle zatvaranja dijaloga se odbacuje
+        if self.db_worker is not None:
+            self.db_worker.cancel("appointment_search")
+        super().done(result)
+
+    def create_title_bar(self):
+        title_bar = QWidget()
+        title_bar.setFixedHeight(40)
+        title_bar.setStyleSheet("background-color: #0C81E4;"
+                                "border-top-left-radius: 12px;"
+                                "border-top-right-radius: 12px;")
+        layout = QHBoxLayout(title_bar)
+        layout.setContentsMargins(10, 0, 10, 0)
+
+        logo = QLabel()
+        logo_path = resource_path("assets/icons/logo.png")
+        logo.setPixmap(QPixmap(logo_path if os.path.exists(logo_path) else "").scaled(68, 62))
+        layout.addWidget(logo)
+
+        title = QLabel("Pretraga izveštaja")
+        title.setStyleSheet("color: white; font-weight: bold; font-size: 16px;")
+        layout.addWidget(title, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        close_btn = QPushButton()
+        close_icon_path = resource_path("assets/icons/close.png")
+        close_btn.setIcon(QIcon(close_icon_path if os.path.exists(close_icon_path) else ""))
+        close_btn.setStyleSheet("border: none;")
+        close_btn.setFixedSize(24, 24)
+        close_btn.clicked.connect(self.close)
+        layout.addWidget(close_btn, alignment=Qt.AlignmentFlag.AlignRight)
+
+        return title_bar
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._is_dragging = True
+            self._drag_pos = event.globalPosition().toPoint()
+
+    def mouseMoveEvent(self, event):
+        if hasattr(self, "_is_dragging") and self._is_dragging:
+            self.move(self.pos() + event.globalPosition().toPoint() - self._drag_pos)
+            self._drag_pos = event.globalPosition().toPoint()
+
+    def mouseReleaseEvent(self, event):
+        self._is_dragging = False
+
+    def apply_shadow(self, widget):
+        shadow = QGraphicsDropShadowEffect()
+        shadow.setBlurRadius(16)
+        shadow.setOffset(0, 4)
+        shadow.setColor(QColor(0, 0, 0, 63))
+        widget.setGraphicsEffect(shadow)
@@ -1,11 +1,12 @@
 import sys
 
 from PyQt6.QtCore import Qt, QDate, QPropertyAnimation, QRect, QEasingCurve
-from PyQt6.QtGui import QColor, QIcon, QPixmap, QFont
+from PyQt6.QtGui import QColor, QIcon, QPixmap, QFont, QTextCharFormat
 from PyQt6.QtWidgets import QGraphicsDropShadowEffect, QPushButton, QHBoxLayout, QLabel, QDateEdit, \
     QVBoxLayout, QDialog, QWidget, QListWidget, QAbstractItemView, QSizePolicy, QListWidgetItem, QFrame
 import os
 from database_manager import DatabaseManager
+from db_worker import submit_or_call
 from gui.patient_card import PatientCard
 from report_generator import generate_day_report_pdf
 
@@ -156,10 +157,16 @@ class SuccessDialog(QDialog):
         self.animation.start()
 
 class DayReportDialog(QDialog):
-    def __init__(self, db_manager, parent=None):
+    # Od ovoliko pregleda (ili 75% najprometnijeg dana u mesecu) dan se označava kao gužva
+    BUSY_DAY_MIN = 3
+
+    def __init__(self, db_manager, parent=None, db_worker=None):
         super().__init__(parent)
         print("DayReportDialog initialized")  # Debug
         self.db_manager = db_manager
+        self.db_worker = db_worker
+        self.day_counts = {}  # "YYYY-MM-DD" -> broj pregleda, za mesec prikazan u kalendaru
+        self.day_counts_month = None
         self.setWindowTitle("Pregled dana")
         self.resize(500, 550)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint)
@@ -359,20 +366,59 @@ class DayReportDialog(QDialog):
 
         self.date_input.dateChanged.connect(self.load_patients_for_date)
 
+        # Dani sa pregledima se ističu u kalendaru; brojevi se čitaju za svaki prikazani mesec
+        calendar.currentPageChanged.connect(self.load_day_counts)
+        self.load_day_counts(calendar.yearShown(), calendar.monthShown())
+
+    def load_day_counts(self, year, month):
+        submit_or_call(
+            self.db_worker,
+            self.db_manager.get_appointment_day_counts, year, month,
+            key="day_counts",
+            callback=lambda counts: self.highlight_days(year, month, counts)
+        )
+
+    def highlight_days(self, year, month, counts):
+        self.day_counts = counts
+        self.day_counts_month = (year, month)
+
+        calendar = self.date_input.calendarWidget()
+        calendar.setDateTextFormat(QDate(), QTextCharFormat())  # briše prethodno označene dane
+        busy = max(self.BUSY_DAY_MIN, 0.75 * max(counts.values(), default=0))
+        for day, count in counts.items():
+            text_format = QTextCharFormat()
+            text_format.setFontWeight(QFont.Weight.Bold)
+            text_format.setBackground(QColor("#93C5FD" if count >= busy else "#DBEAFE"))
+            calendar.setDateTextFormat(QDate.fromString(day, "yyyy-MM-dd"), text_format)
+
     def load_patients_for_date(self, date: QDate):
         self.patient_list.clear()  # očisti staro
 
         # Konvertuj QDate u Python date
         selected_date = date.toPyDate()
 
-        # Povuci podatke
-        patients = self.db_manager.get_patients_by_appointment_date(selected_date)
+        # Dan bez pregleda se vidi već iz brojača po danima, pa nema potrebe za upitom
+        if self.day_counts_month == (date.year(), date.month()) and selected_date.isoformat() not in self.day_counts:
+            if self.db_worker is not None:
+                self.db_worker.cancel("day_report")
+            return
+
+        # Povuci podatke u pozadini; brza promena datuma poništava prethodni zahtev
+        submit_or_call(
+            self.db_worker,
+            self.db_manager.get_patients_by_appointment_date, selected_date,
+            key="day_report",
+            callback=self.show_patients_for_date
+        )
+
+    def show_patients_for_date(self, patients):
+        self.patient_list.clear()
 
         for patient in patients:
-            patient_id, full_name, birthday, address, gender, note = patient
+            birthday = patient.birthday
             birth_year = QDate.fromString(birthday, "yyyy-MM-dd").year() if isinstance(birthday, str) else birthday.year
 
-            card = PatientCard(full_name, str(birth_year))
+            card = PatientCard(patient.full_name, str(birth_year))
             item = QListWidgetItem()
             item.setSizeHint(card.sizeHint())
 
@@ -407,6 +453,12 @@ class DayReportDialog(QDialog):
 
         return title_bar
 
+    def done(self, result):
+        # Rezultat koji stigne posle zatvaranja dijaloga se odbacuje
+        if self.db_worker is not None:
+            self.db_worker.cancel("day_report")
+        super().done(result)
+
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
             self._is_dragging = True
@@ -431,15 +483,24 @@ class DayReportDialog(QDialog):
         # Konvertuj QDate u Python date
         selected_date = self.date_input.date().toPyDate()
 
-        # Povuci podatke
-        patients = self.db_manager.get_patients_by_appointment_date_print_report(selected_date)
+        # Povuci podatke u pozadini; štampa kreće kada stignu
+        self.print_btn.setEnabled(False)
+        submit_or_call(
+            self.db_worker,
+            self.db_manager.get_patients_by_appointment_date_print_report, selected_date,
+            callback=lambda patients: self.print_patients(selected_date, patients),
+            error_callback=self.on_print_failed
+        )
+
+    def print_patients(self, selected_date, patients):
+        self.print_btn.setEnabled(True)
         patient_list = [
             {
                 "order": i + 1,
-                "id": patient[0],
-                "full_name": patient[1],
-                "birthday": patient[2],
-                "phone_number": patient[6]
+                "id": patient.id,
+                "full_name": patient.full_name,
+                "birthday": patient.birthday,
+                "phone_number": patient.phone_number
             }
             for i, patient in enumerate(patients)
         ]
@@ -448,4 +509,9 @@ class DayReportDialog(QDialog):
             generate_day_report_pdf(patient_list, selected_date.strftime('%d-%m-%Y'), logo_path = logo_path)
         except Exception as e:
             warning = WarningDialog(f"Greška pri štampi: {str(e)}", self)
-            warning.exec( )
\ No newline at end of file
+            warning.exec( )
+
+    def on_print_failed(self, error):
+        self.print_btn.setEnabled(True)
+        warning = WarningDialog(f"Greška pri štampi: {str(error)}", self)
+        warning.exec()
\ No newline at end of file
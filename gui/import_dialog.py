@@ -0,0 +1,293 @@
+import os
+import sys
+import threading
+
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QIcon, QPixmap, QFont
+from PyQt6.QtWidgets import QGraphicsDropShadowEffect, QPushButton, QHBoxLayout, QLabel, QLineEdit, \
+    QVBoxLayout, QDialog, QWidget, QProgressBar, QFileDialog, QPlainTextEdit
+
+from importer import run_import
+from utils import log_error
+
+
+def resource_path(relative_path):
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, relative_path)
+    return os.path.abspath(relative_path)
+
+
+class ImportDialog(QDialog):
+    import_progress = pyqtSignal(str, int, int, object)  # (faza, pročitano bajtova, ukupno bajtova, statistika)
+    import_finished = pyqtSignal(object)  # rezultat run_import ili izuzetak
+
+    PHASE_NAMES = {"patients": "Pacijenti", "visits": "Izveštaji"}
+    FILE_FILTER = "Podaci (*.csv *.jsonl *.ndjson)"
+
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.import_thread = None
+        self.imported = False
+
+        self.setWindowTitle("Uvoz podataka")
+        self.resize(560, 420)
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: white;
+                border: 1px solid #d1d5db;
+                border-radius: 12px;
+            }
+        """)
+
+        self.import_progress.connect(self.on_progress)
+        self.import_finished.connect(self.on_finished)
+
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.setSpacing(0)
+
+        main_layout.addWidget(self.create_title_bar())
+
+        content_layout = QVBoxLayout()
+        content_layout.setContentsMargins(24, 24, 24, 24)
+        content_layout.setSpacing(12)
+
+        # === Izbor fajlova ===
+        self.patients_input = self.create_file_row(content_layout, "Pacijenti (CSV ili JSONL)")
+        self.visits_input = self.create_file_row(content_layout, "Izveštaji (CSV ili JSONL)")
+
+        hint = QLabel("Excel tabele prvo sačuvajte kao CSV.")
+        hint.setStyleSheet("color: #6B7280;")
+        content_layout.addWidget(hint)
+
+        # === Napredak ===
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setFixedHeight(10)
+        self.progress_bar.setStyleSheet("""
+            QProgressBar {
+                background-color: #f3f4f6;
+                border: none;
+                border-radius: 5px;
+            }
+            QProgressBar::chunk {
+                background-color: #0C81E4;
+                border-radius: 5px;
+            }
+        """)
+        content_layout.addWidget(self.progress_bar)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #6B7280;")
+        content_layout.addWidget(self.status_label)
+
+        self.error_output = QPlainTextEdit()
+        self.error_output.setReadOnly(True)
+        self.error_output.setStyleSheet("background-color: #f9fafb; border: none; border-radius: 8px;")
+        self.error_output.hide()
+        content_layout.addWidget(self.error_output)
+        content_layout.addStretch()
+
+        # === Dugmad ===
+        btn_layout = QHBoxLayout()
+        self.start_btn = QPushButton("Uvezi")
+        self.start_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #0C81E4;
+                color: white;
+                font-weight: bold;
+                padding: 8px 20px;
+                border-radius: 24px;
+            }
+            QPushButton:hover {
+                background-color: #106FCC;
+            }
+            QPushButton:disabled {
+                background-color: #93C5FD;
+            }
+        """)
+        self.start_btn.clicked.connect(self.start_import)
+        self.apply_shadow(self.start_btn)
+
+        self.close_btn = QPushButton("Zatvori")
+        self.close_btn.setStyleSheet("""
+            QPushButton {
+                background-color: white;
+                font-weight: bold;
+                padding: 8px 20px;
+                border-radius: 24px;
+            }
+            QPushButton:hover {
+                background-color: #e5e7eb;
+            }
+        """)
+        self.close_btn.clicked.connect(self.close)
+        self.apply_shadow(self.close_btn)
+
+        btn_layout.addWidget(self.start_btn)
+        btn_layout.addWidget(self.close_btn)
+        content_layout.addLayout(btn_layout)
+
+        main_layout.addLayout(content_layout)
+
+    def create_file_row(self, layout, label_text):
+        label = QLabel(label_text)
+        label.setFont(QFont("Inter", 10, QFont.Weight.Bold))
+        layout.addWidget(label)
+
+        row = QHBoxLayout()
+        path_input = QLineEdit()
+        path_input.setStyleSheet("background-color: #f3f4f6; border: none; border-radius: 8px; padding: 6px;")
+        browse_btn = QPushButton("Izaberi...")
+        browse_btn.setStyleSheet("""
+            QPushButton {
+                background-color: white;
+                padding: 6px 14px;
+                border-radius: 16px;
+            }
+            QPushButton:hover {
+                background-color: #e5e7eb;
+            }
+        """)
+        self.apply_shadow(browse_btn)
+        browse_btn.clicked.connect(lambda: self.choose_file(path_input))
+        row.addWidget(path_input)
+        row.addWidget(browse_btn)
+        layout.addLayout(row)
+        return path_input
+
+    def choose_file(self, path_input):
+        path, _ = QFileDialog.getOpenFileName(self, "Izaberi fajl", "", self.FILE_FILTER)
+        if path:
+            path_input.setText(path)
+
+    def start_import(self):
+        patients_path = self.patients_input.text().strip() or None
+        visits_path = self.visits_input.text().strip() or None
+        if not patients_path and not visits_path:
+            self.status_label.setText("Izaberite bar jedan fajl.")
+            return
+        for path in (patients_path, visits_path):
+            if path and not os.path.isfile(path):
+                self.status_label.setText(f"Fajl ne postoji: {path}")
+                return
+
+        self.start_btn.setEnabled(False)
+        self.close_btn.setEnabled(False)
+        self.error_output.hide()
+        self.progress_bar.setValue(0)
+        self.status_label.setText("Uvoz je u toku...")
+        # Uvoz ide na posebnoj niti da prozor ostane živ; napredak stiže preko signala
+        self.import_thread = threading.Thread(
+            target=self._run, args=(patients_path, visits_path), name="db-import", daemon=True
+        )
+        self.import_thread.start()
+
+    def _run(self, patients_path, visits_path):
+        try:
+            summary = run_import(
+                self.db_manager, patients_path, visits_path, progress_callback=self.import_progress.emit
+            )
+        except Exception as e:
+            log_error(f"Import failed: {e}")
+            summary = e
+        finally:
+            self.db_manager.release_connection()
+        self.import_finished.emit(summary)
+
+    def on_progress(self, phase, bytes_read, total_bytes, stats):
+        # Pacijenti zauzimaju prvu polovinu trake ako se uvoze i izveštaji
+        both = bool(self.patients_input.text().strip() and self.visits_input.text().strip())
+        fraction = bytes_read / total_bytes if total_bytes else 1.0
+        if both:
+            fraction = fraction / 2 + (0.5 if phase == "visits" else 0.0)
+        self.progress_bar.setValue(int(fraction * 1000))
+        self.status_label.setText(
+            f"{self.PHASE_NAMES[phase]}: pročitano {stats['read']}, uvezeno {stats['inserted']}, "
+            f"duplikata {stats['duplicates']}"
+        )
+
+    def on_finished(self, summary):
+        self.import_thread = None
+        self.start_btn.setEnabled(True)
+        self.close_btn.setEnabled(True)
+        if isinstance(summary, Exception):
+            self.status_label.setText(f"Uvoz nije uspeo: {summary}")
+            return
+
+        self.imported = True
+        self.progress_bar.setValue(1000)
+        lines = []
+        if summary["patients"] is not None:
+            stats = summary["patients"]
+            lines.append(f"Pacijenti: uvezeno {stats['inserted']}, duplikata {stats['duplicates']}")
+        if summary["visits"] is not None:
+            stats = summary["visits"]
+            lines.append(f"Izveštaji: uvezeno {stats['inserted']}, duplikata {stats['duplicates']}, "
+                         f"bez pacijenta {stats['unmatched']}")
+        lines.append(f"Odbijeno redova: {summary['rejected']} ({summary['rows_per_second']:.0f} redova/s)")
+        self.status_label.setText("\n".join(lines))
+        if summary["errors"]:
+            self.error_output.setPlainText("\n".join(summary["errors"]))
+            self.error_output.show()
+
+    def closeEvent(self, event):
+        # Ne zatvaraj dok uvoz traje; transakcija po grupi bi ostala napola
+        if self.import_thread is not None:
+            event.ignore()
+            return
+        if self.imported:
+            self.accept()
+        super().closeEvent(event)
+
+    def create_title_bar(self):
+        title_bar = QWidget()
+        title_bar.setFixedHeight(40)
+        title_bar.setStyleSheet("background-color: #0C81E4;"
+                                "border-top-left-radius: 12px;"
+                                "border-top-right-radius: 12px;")
+        layout = QHBoxLayout(title_bar)
+        layout.setContentsMargins(10, 0, 10, 0)
+
+        logo = QLabel()
+        logo_path = resource_path("assets/icons/logo.png")
+        logo.setPixmap(QPixmap(logo_path if os.path.exists(logo_path) else "").scaled(68, 62))
+        layout.addWidget(logo)
+
+        title = QLabel("Uvoz podataka")
+        title.setStyleSheet("color: white; font-weight: bold; font-size: 16px;")
+        layout.addWidget(title, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        close_btn = QPushButton()
+        close_icon_path = resource_path("assets/icons/close.png")
+        close_btn.setIcon(QIcon(close_icon_path if os.path.exists(close_icon_path) else ""))
+        close_btn.setStyleSheet("border: none;")
+        close_btn.setFixedSize(24, 24)
+        close_btn.clicked.connect(self.close)
+        layout.addWidget(close_btn, alignment=Qt.AlignmentFlag.AlignRight)
+
+        return title_bar
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._is_dragging = True
+            self._drag_pos = event.globalPosition().toPoint()
+
+    def mouseMoveEvent(self, event):
+        if hasattr(self, "_is_dragging") and self._is_dragging:
+            self.move(self.pos() + event.globalPosition().toPoint() - self._drag_pos)
+            self._drag_pos = event.globalPosition().toPoint()
+
+    def mouseReleaseEvent(self, event):
+        self._is_dragging = False
+
+    def apply_shadow(self, widget):
+        shadow = QGraphicsDropShadowEffect()
+        shadow.setBlurRadius(16)
+        shadow.setOffset(0, 4)
+        shadow.setColor(QColor(0, 0, 0, 63))
+        widget.setGraphicsEffect(shadow)
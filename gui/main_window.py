@@ -6,13 +6,16 @@ from PyQt6.QtWidgets import (
     QListWidget, QLineEdit, QTextEdit, QFrame, QGraphicsDropShadowEffect, QSizePolicy, QGridLayout, QListWidgetItem,
     QDialog, QAbstractItemView
 )
-from PyQt6.QtCore import Qt, QDate, pyqtSignal
+from PyQt6.QtCore import Qt, QDate, QTimer, pyqtSignal
 from PyQt6.QtGui import QColor, QPixmap, QFontDatabase, QFont, QIcon, QFontMetrics
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, SEARCH_RESULT_LIMIT
+from db_worker import DatabaseWorker
 from datetime import datetime
 from gui.add_patient_dialog import AddPatientDialog
 from gui.add_report_dialog import AddReportDialog
+from gui.appointment_search_dialog import AppointmentSearchDialog
 from gui.day_report_dialog import DayReportDialog
+from gui.import_dialog import ImportDialog
 from gui.patient_card import PatientCard
 from gui.update_report_dialog import UpdateReportDialog
 from gui.update_patient_dialog import UpdatePatientDialog, WarningDialog
@@ -441,9 +444,40 @@ class SuccessPatientDialog(QDialog):
 # Kraj prozora za pacijente!
 
 class MainWindow(QMainWindow):
+    PATIENT_PAGE_SIZE = 100
+    APPOINTMENT_PAGE_SIZE = 30
+    SEARCH_DEBOUNCE_MS = 250  # pretraga pacijenata kreće tek kada kucanje stane ovoliko ms
+    schema_progress = pyqtSignal(int, int, str)  # (urađeno, ukupno, opis) iz pozadinske migracije
+    schema_finished = pyqtSignal(bool)  # pozadinska migracija je stala (True = završena)
+
     def __init__(self, db_manager: DatabaseManager):
         super().__init__()
         self.db_manager = db_manager
+        # Svi pozivi ka bazi iz GUI-ja idu preko ove pozadinske niti
+        self.db_worker = DatabaseWorker(db_manager)
+        # Signal se emituje iz niti migracije, pa do naslova stiže preko Qt reda događaja
+        self.schema_progress.connect(self.on_schema_progress)
+        self.schema_finished.connect(self.on_schema_finished)
+        # Zadatak migracije drži zaključan upis dok traje, pa su izmene isključene dok se ne završi
+        self.edit_buttons = []
+        self.schema_tasks_running = db_manager.start_schema_tasks(
+            self.schema_progress.emit, self.schema_finished.emit
+        )
+        db_manager.start_audio_janitor()
+        # Pregledi stariji od "archive_after_days" se sele u archive.db na posebnoj niti, pa ne zadržavaju
+        # učitavanje liste i pretrage koje idu preko db_worker-a
+        db_manager.start_archiving()
+        self.patient_pages = None
+        self.patients_loading = False
+        self.patient_ids = []  # id pacijenta za svaki red liste, istim redom kao kartice
+        self.appointment_pages = None
+        self.appointments_loading = False
+        # (upit, dokumenti) potpunih rezultata pretrage koji su u listi; duži upit ih samo sužava
+        self.search_base = None
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(lambda: self.filter_patients(self.search_input.text()))
         self.setWindowTitle("Doktorska evidencija test")
         self.resize(1000, 700)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint)  # Skini sistemski title bar
@@ -520,55 +554,86 @@ class MainWindow(QMainWindow):
 
         content.addWidget(self.create_left_panel())
         content.addWidget(self.create_right_panel())
+        self.set_editing_enabled(not self.schema_tasks_running)
         self.load_patients()
+        # Indeks imena za pretragu sa greškama u kucanju se puni u pozadini, iza prve strane pacijenata
+        self.db_worker.submit(self.db_manager.load_name_index)
 
     # Funkcije vezane za pacijente!
 
     def load_patients(self):
         self.patient_list.clear()
         self.cards = []
+        self.patient_ids = []
+        self.search_base = None
 
-        patients = self.db_manager.get_all_patients()
-        for i, patient in enumerate(patients):
-            full_name = patient[3]
-            birthday = patient[7]
-            if birthday:
-                birth_year = str(birthday).split("-")[0]
-            else:
-                birth_year = "N/A"
-
-            card = PatientCard(full_name, birth_year)
-            item = QListWidgetItem()
-            item.setSizeHint(card.sizeHint())
-            item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-
-            self.patient_list.addItem(item)
-            self.patient_list.setItemWidget(item, card)
-            self.cards.append(card)
+        # Pacijenti se učitavaju u stranama, sledeća strana tek kada se skroluje do dna
+        self.patient_pages = self.db_manager.iter_patients(page_size=self.PATIENT_PAGE_SIZE, order_by="id")
+        self.patients_loading = False
+        self.load_more_patients()
 
         #if self.cards:
         #    self.select_patient(0)
 
-        self.patient_list.currentRowChanged.connect(self.select_patient)
+    def load_more_patients(self):
+        if self.patient_pages is None or self.patients_loading:
+            return
+        self.patients_loading = True
+        # Strana se čita u pozadini; novi load_patients poništava zahtev za staru listu
+        self.db_worker.submit(next, self.patient_pages, None, key="patient_page", callback=self.on_patient_page_loaded)
+
+    def on_patient_page_loaded(self, page):
+        self.patients_loading = False
+        if page is None:
+            self.patient_pages = None
+            return
+
+        for patient in page:
+            self.add_patient_card(patient)
+
+    def add_patient_card(self, patient):
+        card = PatientCard(patient.full_name, patient.birth_year)
+        item = QListWidgetItem()
+        item.setSizeHint(card.sizeHint())
+        item.setFlags(Qt.ItemFlag.ItemIsEnabled)
+
+        self.patient_list.addItem(item)
+        self.patient_list.setItemWidget(item, card)
+        self.cards.append(card)
+        self.patient_ids.append(patient.id)
+
+    def on_patient_list_scroll(self, value):
+        if value >= self.patient_list.verticalScrollBar().maximum():
+            self.load_more_patients()
 
     def select_patient(self, index):
         for i, card in enumerate(self.cards):
             card.set_selected(i == index)
 
-        if 0 <= index < len(self.cards):
-            patient = self.db_manager.get_all_patients()[index]
-            self.selected_patient_id = patient[0]
-            self.update_patient_info(patient)
-            self.load_appointment_history(patient[0])  # Dodaj ovo
+        if 0 <= index < len(self.patient_ids):
+            self.show_patient(self.patient_ids[index])
+
+    def show_patient(self, patient_id):
+        # get_patient čita iz keša, pa ponovni klik na istog pacijenta ne ide u bazu; noviji klik poništava stariji
+        self.db_worker.submit(
+            self.db_manager.get_patient, patient_id, key="patient_detail", callback=self.on_patient_loaded
+        )
+
+    def on_patient_loaded(self, patient):
+        if patient is None:
+            return
+        self.selected_patient_id = patient.id
+        self.update_patient_info(patient)
+        self.load_appointment_history(patient.id)  # Dodaj ovo
 
     def update_patient_info(self, patient):
-        patient_id = patient[0] #ID odnosno pacijentov karton
-        full_name = patient[3] or "-"
-        phone = patient[4] or "-"
-        gender = patient[6] or "-"
-        birth_date = patient[7] or "-"
-        address = patient[8] or "-"
-        note = patient[9] or ""
+        patient_id = patient.id #ID odnosno pacijentov karton
+        full_name = patient.full_name or "-"
+        phone = patient.phone_number or "-"
+        gender = patient.gender or "-"
+        birth_date = patient.birthday or "-"
+        address = patient.address or "-"
+        note = patient.note or ""
 
         birth_date_str = "-"
         try:
@@ -604,8 +669,9 @@ class MainWindow(QMainWindow):
             name = name_parts[0]
             last_name = name_parts[1] if len(name_parts) > 1 else ""
 
-            # Čuvamo u bazu
-            self.db_manager.add_patient(
+            # Čuvamo u bazu, u pozadini; poruka i osvežen prikaz stižu kada se upis završi
+            self.db_worker.submit(
+                self.db_manager.add_patient,
                 name=name,
                 last_name=last_name,
                 phone_number=data["phone_number"],
@@ -613,13 +679,23 @@ class MainWindow(QMainWindow):
                 gender=data["gender"],
                 birthday=data["birthday"],
                 address=data["address"],
-                note=data["note"]
+                note=data["note"],
+                callback=self.on_patient_added,
+                error_callback=self.on_patient_save_failed
             )
 
-            self.load_patients()  # osvežimo prikaz
+    def on_patient_added(self, patient_id):
+        if patient_id is None:
+            self.on_patient_save_failed(None)
+            return
+        self.load_patients()  # osvežimo prikaz
+
+        dialog = SuccessPatientDialog(parent=self)
+        dialog.exec()
 
-            dialog = SuccessPatientDialog(parent=self)
-            dialog.exec()
+    def on_patient_save_failed(self, error):
+        warning = WarningDialog("Pacijent nije sačuvan. Pokušajte ponovo.", self)
+        warning.exec()
 
     def on_edit_patient(self):
         current_row = self.patient_list.currentRow()
@@ -628,26 +704,29 @@ class MainWindow(QMainWindow):
             warning.exec()
             return
 
-        all_patients = self.db_manager.get_all_patients()
-        selected_patient = all_patients[current_row]
-        patient_id = selected_patient[0]
+        # Podaci za formu stižu iz pozadinske niti
+        self.db_worker.submit(
+            self.db_manager.get_patient, self.patient_ids[current_row],
+            key="patient_edit", callback=self.open_update_patient_dialog
+        )
 
-        patient_data = self.db_manager.get_patient(patient_id)
+    def open_update_patient_dialog(self, patient_data):
         if not patient_data:
             print("Greška: Pacijent nije pronađen.")
             return
+        patient_id = patient_data.id
 
         dialog = UpdatePatientDialog(self)
         try:
             dialog.set_data({
-                "full_name": patient_data[3],  # full_name
-                "birthday": patient_data[7],  # birthday
-                "gender": patient_data[6],  # gender
-                "address": patient_data[8],  # address
-                "note": patient_data[9],  # note
-                "phone_number": patient_data[4] # phone number
+                "full_name": patient_data.full_name,
+                "birthday": patient_data.birthday,
+                "gender": patient_data.gender,
+                "address": patient_data.address,
+                "note": patient_data.note,
+                "phone_number": patient_data.phone_number
             })
-        except IndexError as e:
+        except (AttributeError, TypeError) as e:
             print("Greška pri učitavanju podataka:", e)
             return
 
@@ -657,7 +736,8 @@ class MainWindow(QMainWindow):
             name = name_parts[0]
             last_name = name_parts[1] if len(name_parts) > 1 else ""
 
-            self.db_manager.update_patient(
+            self.db_worker.submit(
+                self.db_manager.update_patient,
                 patient_id=patient_id,
                 name=name,
                 last_name=last_name,
@@ -665,12 +745,19 @@ class MainWindow(QMainWindow):
                 phone_number=updated["phone_number"],
                 gender=updated["gender"],
                 address=updated["address"],
-                note=updated["note"]
+                note=updated["note"],
+                callback=self.on_patient_updated,
+                error_callback=self.on_patient_save_failed
             )
-            self.load_patients()
 
-            dialog = EditPatientDialog(parent=self)
-            dialog.exec()
+    def on_patient_updated(self, success):
+        if not success:
+            self.on_patient_save_failed(None)
+            return
+        self.load_patients()
+
+        dialog = EditPatientDialog(parent=self)
+        dialog.exec()
 
     def on_delete_patient(self):
         current_row = self.patient_list.currentRow()
@@ -679,41 +766,86 @@ class MainWindow(QMainWindow):
 
         dialog = ConfirmDeletePatientDialog(parent=self)
         if dialog.exec():  # korisnik kliknuo "Da"
-            selected_patient = self.db_manager.get_all_patients()[current_row]
-            self.db_manager.delete_patient(selected_patient[0])
+            # Backup i brisanje fajlova traju, pa se rade u pozadini
+            self.db_worker.submit(
+                self.db_manager.delete_patient, self.patient_ids[current_row],
+                callback=lambda success: self.load_patients()
+            )
+
+    def on_search_text_changed(self, text):
+        # Upit koji je u toku više ne odgovara unosu; rezultat mu se odbacuje
+        self.db_worker.cancel("patient_search")
+        self.search_timer.stop()
+        text = text.strip()
+        if not text:
+            # Ako nema unosa, prikaži sve pacijente
             self.load_patients()
+            return
+        if not self.refine_patient_search(text):
+            self.search_timer.start()
 
     def filter_patients(self, text):
         text = text.strip()
         if not text:
-            # Ako nema unosa, prikaži sve pacijente
             self.load_patients()
             return
+        # 🔍 Pretraga ide u pozadini; noviji upit poništava stariji preko istog ključa
+        self.db_worker.submit(
+            self.find_patients, text, key="patient_search", callback=partial(self.on_patients_found, text)
+        )
 
-        # 🔍 Dobavi filtrirane pacijente iz baze
+    def find_patients(self, text):
+        """Runs on the db_worker thread. Returns (patients, search documents or None)."""
         patients = self.db_manager.search_patients(text)
+        if patients:
+            documents = None
+            # Potpuna lista pogodaka može da se sužava u memoriji dok se upit produžava
+            if len(patients) < SEARCH_RESULT_LIMIT and not DatabaseManager.is_structured_query(text):
+                documents = self.db_manager.get_patient_search_documents(patient.id for patient in patients)
+            return patients, documents
+        # Nema tačnih pogodaka: prvo imena koja se isto izgovaraju ("Djordjevich" -> "Đorđević"),
+        # pa imena slična upitu ("Jovnović" -> "Jovanović")
+        patients = (self.db_manager.search_patients(text, mode="phonetic") or
+                    self.db_manager.fuzzy_search_patients(text))
+        return patients, None
+
+    def on_patients_found(self, text, result):
+        patients, documents = result
+        self.patient_pages = None  # rezultati pretrage se ne dopunjuju stranama
+        self.db_worker.cancel("patient_page")
 
         # Očisti listu i kartice
         self.patient_list.clear()
         self.cards = []
+        self.patient_ids = []
 
         # Dodaj samo pronađene pacijente
         for patient in patients:
-            full_name = patient[3]  # full_name je na indexu 3
-            birthday = patient[7]  # birthday na indexu 7
-            birth_year = str(birthday).split("-")[0] if birthday else "N/A"
-
-            card = PatientCard(full_name, birth_year)
-            item = QListWidgetItem()
-            item.setSizeHint(card.sizeHint())
-            item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-
-            self.patient_list.addItem(item)
-            self.patient_list.setItemWidget(item, card)
-            self.cards.append(card)
-
-        # 🔗 Poveži selekciju na novu listu
-        self.patient_list.currentRowChanged.connect(self.select_patient)
+            self.add_patient_card(patient)
+        self.search_base = (text, documents) if documents is not None else None
+
+    def refine_patient_search(self, text):
+        """Narrows the shown results in memory when `text` extends their query. Returns False if it cannot."""
+        # Upit od samih cifara traži i po broju kartona, a datum, godina i telefon po svojim indeksima;
+        # takvi pogoci se ne vide u dokumentima ranijih rezultata
+        if self.search_base is None or text.isdigit() or DatabaseManager.is_structured_query(text):
+            return False
+        base_text, documents = self.search_base
+        if not text.startswith(base_text):
+            return False
+        visible = [
+            patient_id in documents and DatabaseManager.patient_matches_query(documents[patient_id], text)
+            for patient_id in self.patient_ids
+        ]
+        if not any(visible):
+            return False  # neka baza proba i fonetsku pretragu i pretragu sličnih imena
+        # Redovi se samo sakrivaju, pa kartice i patient_ids ostaju poravnati sa redovima liste
+        for row, shown in enumerate(visible):
+            self.patient_list.item(row).setHidden(not shown)
+        current_row = self.patient_list.currentRow()
+        if 0 <= current_row < len(visible) and not visible[current_row]:
+            self.patient_list.setCurrentRow(-1)
+        return True
 
     # Funkcije vezane za appointmente!
 
@@ -741,7 +873,8 @@ class MainWindow(QMainWindow):
             patient_id=self.selected_patient_id,
             db_manager=self.db_manager,
             refresh_callback=self.load_appointment_history,
-            parent=self
+            parent=self,
+            db_worker=self.db_worker
         )
 
         dialog.set_data({
@@ -772,9 +905,14 @@ class MainWindow(QMainWindow):
             "Da li ste sigurni da želite da obrišete izveštaj?", parent=self
         )
         if dialog.exec():
-            success = self.db_manager.delete_appointment(appointment_id)
-            if success:
-                self.load_appointment_history(self.selected_patient_id)
+            self.db_worker.submit(
+                self.db_manager.delete_appointment, appointment_id,
+                callback=partial(self.on_appointment_deleted, self.selected_patient_id)
+            )
+
+    def on_appointment_deleted(self, patient_id, success):
+        if success:
+            self.load_appointment_history(patient_id)
 
     def on_add_report(self):
         current_row = self.patient_list.currentRow()
@@ -783,14 +921,14 @@ class MainWindow(QMainWindow):
             warning.exec()
             return  # nijedan pacijent nije selektovan
 
-        patient = self.db_manager.get_all_patients()[current_row]
-        patient_id = patient[0]
+        patient_id = self.patient_ids[current_row]
 
         dialog = AddReportDialog(
             patient_id=patient_id,
             db_manager=self.db_manager,
             refresh_callback=self.load_appointment_history,  # 🟢 povezujemo osvežavanje
-            parent=self
+            parent=self,
+            db_worker=self.db_worker
         )
         dialog.exec()
 
@@ -804,12 +942,28 @@ class MainWindow(QMainWindow):
 
         self.appointment_ids = []  # čuvamo ID-jeve redom
 
-        appointments = self.db_manager.get_appointments_by_patient_id(patient_id)
+        self.appointment_pages = self.db_manager.iter_appointments(patient_id, page_size=self.APPOINTMENT_PAGE_SIZE)
+        self.appointments_loading = False
+        self.load_more_appointments()
+
+    def load_more_appointments(self):
+        if self.appointment_pages is None or self.appointments_loading:
+            return
+        self.appointments_loading = True
+        self.db_worker.submit(
+            next, self.appointment_pages, None, key="appointment_page", callback=self.on_appointment_page_loaded
+        )
+
+    def on_appointment_page_loaded(self, appointments):
+        self.appointments_loading = False
+        if appointments is None:
+            self.appointment_pages = None
+            return
+
         for appointment in appointments:
-            appointment_id, date, diagnose = appointment
-            self.appointment_ids.append(appointment_id)
-            card = AppointmentCard(appointment_id, date, diagnose)
-            card.full_diagnose = diagnose
+            self.appointment_ids.append(appointment.id)
+            card = AppointmentCard(appointment.id, appointment.date, appointment.diagnose_text)
+            card.full_diagnose = appointment.diagnose_text
 
             # poveži klik
             card.clicked.connect(partial(self.select_appointment_card, card))
@@ -821,12 +975,40 @@ class MainWindow(QMainWindow):
             self.history_list.addItem(item)
             self.history_list.setItemWidget(item, card)
 
+    def on_history_list_scroll(self, value):
+        if value >= self.history_list.verticalScrollBar().maximum():
+            self.load_more_appointments()
+
     # Dugme za day report!
 
     def on_day_report(self):
-        dialog = DayReportDialog(self.db_manager, self)
+        dialog = DayReportDialog(self.db_manager, self, db_worker=self.db_worker)
         dialog.exec()
 
+    # Pretraga izveštaja!
+
+    def on_import(self):
+        dialog = ImportDialog(self.db_manager, self)
+        if dialog.exec():
+            self.load_patients()  # osvežimo prikaz
+
+    def on_search_appointments(self):
+        dialog = AppointmentSearchDialog(self.db_manager, self, db_worker=self.db_worker)
+        if dialog.exec() and dialog.selected_patient_id is not None:
+            # Selektuj pacijenta čiji je izveštaj izabran; pretraga se ne briše, jer bi brisanje
+            # ponovo učitalo listu i ispraznilo patient_ids pre provere
+            patient_id = dialog.selected_patient_id
+            if patient_id in self.patient_ids:
+                index = self.patient_ids.index(patient_id)
+                self.patient_list.setCurrentRow(index)
+                self.select_patient(index)
+            else:
+                # Pacijent nije u prikazanoj listi (filter ili neučitana strana): vrati punu listu
+                # i prikaži karton direktno
+                self.search_input.clear()
+                self.select_patient(-1)
+                self.show_patient(patient_id)
+
 
     # Custom title bar!
 
@@ -845,10 +1027,10 @@ class MainWindow(QMainWindow):
         layout.addWidget(logo, 0, 0, alignment=Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
 
         # === NASLOV ===
-        title = QLabel("Doktorska evidencija")
-        title.setStyleSheet("color: white; font-weight: bold; font-size: 16px;")
-        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(title, 0, 1, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.title_label = QLabel("Doktorska evidencija")
+        self.title_label.setStyleSheet("color: white; font-weight: bold; font-size: 16px;")
+        self.title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.title_label, 0, 1, alignment=Qt.AlignmentFlag.AlignCenter)
 
         # === IKONICE ===
         icon_container = QWidget()
@@ -886,6 +1068,28 @@ class MainWindow(QMainWindow):
 
         return title_bar
 
+    def on_schema_progress(self, done, total, description):
+        if done < total:
+            self.title_label.setText(f"Doktorska evidencija — {description} ({done + 1}/{total})")
+        else:
+            self.title_label.setText("Doktorska evidencija")
+
+    def on_schema_finished(self, success):
+        self.schema_tasks_running = False
+        self.title_label.setText("Doktorska evidencija")
+        self.set_editing_enabled(True)
+
+    def set_editing_enabled(self, enabled):
+        tooltip = "" if enabled else "Baza se ažurira; izmene će biti moguće kada se ažuriranje završi."
+        for button in self.edit_buttons:
+            button.setEnabled(enabled)
+            button.setToolTip(tooltip)
+
+    def closeEvent(self, event):
+        # Sačekaj da se završe započeti upisi pre gašenja
+        self.db_worker.shutdown()
+        super().closeEvent(event)
+
     def toggle_maximize_restore(self):
         if self.isMaximized():
             self.showNormal()
@@ -925,10 +1129,10 @@ class MainWindow(QMainWindow):
         icon_label.setStyleSheet("background-color: transparent;")
 
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Pretraži pacijente")
+        self.search_input.setPlaceholderText("Pretraži pacijente (ime, karton, 1978, 15.03.1980, 063 42)")
         self.search_input.setFont(QFont("Montserrat", 11, QFont.Weight.Medium))
         self.search_input.setStyleSheet("border: none; background-color: transparent; font-size: 14px;")
-        self.search_input.textChanged.connect(self.filter_patients)
+        self.search_input.textChanged.connect(self.on_search_text_changed)
 
         search_layout.addWidget(icon_label)
         search_layout.addWidget(self.search_input)
@@ -939,6 +1143,9 @@ class MainWindow(QMainWindow):
         self.patient_list = QListWidget()
         self.patient_list.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
         self.patient_list.verticalScrollBar().setSingleStep(10)
+        self.patient_list.verticalScrollBar().valueChanged.connect(self.on_patient_list_scroll)
+        # Jedan handler selekcije za sve što se u listi prikazuje, i strane i rezultate pretrage
+        self.patient_list.currentRowChanged.connect(self.select_patient)
         self.patient_list.setStyleSheet("""
             QListWidget {
                 background-color: white;
@@ -1003,6 +1210,7 @@ class MainWindow(QMainWindow):
         self.apply_shadow(btn_add_patient)
         btn_add_patient.clicked.connect(self.on_add_patient)
         button_layout.addWidget(btn_add_patient)
+        self.edit_buttons.append(btn_add_patient)
 
         # Izmeni pacijenta
         btn_edit_patient = QPushButton("Izmeni pacijenta")
@@ -1021,6 +1229,7 @@ class MainWindow(QMainWindow):
         self.apply_shadow(btn_edit_patient)
         btn_edit_patient.clicked.connect(self.on_edit_patient)  # Definiši metodu
         button_layout.addWidget(btn_edit_patient)
+        self.edit_buttons.append(btn_edit_patient)
 
         # Obriši pacijenta
         btn_delete_patient = QPushButton("Obriši pacijenta")
@@ -1039,10 +1248,30 @@ class MainWindow(QMainWindow):
         self.apply_shadow(btn_delete_patient)
         btn_delete_patient.clicked.connect(self.on_delete_patient)  # Definiši metodu
         button_layout.addWidget(btn_delete_patient)
+        self.edit_buttons.append(btn_delete_patient)
 
         # Dodaj layout u glavni layout
         layout.addLayout(button_layout)
 
+        # Uvoz podataka iz starog programa
+        btn_import = QPushButton("Uvoz podataka")
+        btn_import.setStyleSheet("""
+            QPushButton {
+                background-color: #ffffff;
+                color: #111827;
+                font-weight: bold;
+                padding: 8px 16px;
+                border-radius: 24px;
+            }
+            QPushButton:hover {
+                background-color: #e5e7eb;
+            }
+        """)
+        self.apply_shadow(btn_import)
+        btn_import.clicked.connect(self.on_import)
+        layout.addWidget(btn_import)
+        self.edit_buttons.append(btn_import)
+
         return panel
 
     def create_right_panel(self):
@@ -1145,6 +1374,7 @@ class MainWindow(QMainWindow):
         self.history_list = QListWidget()
         self.history_list.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
         self.history_list.verticalScrollBar().setSingleStep(10)
+        self.history_list.verticalScrollBar().valueChanged.connect(self.on_history_list_scroll)
         self.history_list.setSpacing(14)
         self.history_list.setStyleSheet("""
             QListWidget {
@@ -1246,10 +1476,28 @@ class MainWindow(QMainWindow):
                 """)
         self.apply_shadow(btn_day_report)
 
+        btn_search_reports = QPushButton("Pretraga izveštaja")
+        btn_search_reports.clicked.connect(self.on_search_appointments)
+        btn_search_reports.setStyleSheet("""
+            QPushButton {
+                background-color: #ffffff;
+                color: #111827;
+                font-weight: bold;
+                padding: 8px 16px;
+                border-radius: 24px;
+            }
+            QPushButton:hover {
+                background-color: #e5e7eb;
+            }
+        """)
+        self.apply_shadow(btn_search_reports)
+
         button_layout.addWidget(btn_add_report)
         button_layout.addWidget(btn_edit_report)
         button_layout.addWidget(btn_delete_report)
+        self.edit_buttons.extend((btn_add_report, btn_edit_report, btn_delete_report))
         button_layout.addWidget(btn_day_report)
+        button_layout.addWidget(btn_search_reports)
 
 
         layout.addLayout(button_layout)
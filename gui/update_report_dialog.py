@@ -7,6 +7,7 @@ from PyQt6.QtGui import QColor, QIcon, QPixmap, QDesktopServices
 from PyQt6.QtWidgets import QGraphicsDropShadowEffect, QPushButton, QHBoxLayout, QTextEdit, QLabel, QDateEdit, \
     QVBoxLayout, QDialog, QWidget
 import os
+from db_worker import submit_or_call
 from speech_processor import SpeechProcessor
 from report_generator import generate_appointment_pdf
 
@@ -160,11 +161,12 @@ class SuccessDialog(QDialog):
 
 
 class UpdateReportDialog(QDialog):
-    def __init__(self, appointment_id, patient_id, db_manager, refresh_callback=None, parent=None):
+    def __init__(self, appointment_id, patient_id, db_manager, refresh_callback=None, parent=None, db_worker=None):
         super().__init__(parent)
         self.appointment_id = appointment_id
         self.patient_id = patient_id
         self.db_manager = db_manager
+        self.db_worker = db_worker
         self.refresh_callback = refresh_callback
         self.setWindowTitle("Izmeni izveštaj")
         self.resize(500, 550)
@@ -427,14 +429,22 @@ class UpdateReportDialog(QDialog):
             warning.exec()
             return
 
-        success = self.db_manager.update_appointment(
+        # Upis ide u pozadinsku nit; dugme je isključeno dok ne stigne odgovor
+        self.save_btn.setEnabled(False)
+        submit_or_call(
+            self.db_worker,
+            self.db_manager.update_appointment,
             appointment_id=self.appointment_id,
             id_patient=self.patient_id,
             date=date_str,
             diagnose_text=diagnose_text,
-            diagnose_sound=None
+            diagnose_sound=None,
+            callback=self.on_report_updated,
+            error_callback=self.on_report_update_failed
         )
 
+    def on_report_updated(self, success):
+        self.save_btn.setEnabled(True)
         if success:
             dialog = SuccessDialog("Uspešno ste izmenili izveštaj!", self)
             dialog.exec()
@@ -445,6 +455,11 @@ class UpdateReportDialog(QDialog):
             warning = WarningDialog("Došlo je do greške pri izmeni izveštaja.", self)
             warning.exec()
 
+    def on_report_update_failed(self, error):
+        self.save_btn.setEnabled(True)
+        warning = WarningDialog(f"Greška pri izmeni izveštaja: {str(error)}", self)
+        warning.exec()
+
     def create_title_bar(self):
         title_bar = QWidget()
         title_bar.setFixedHeight(40)
@@ -494,16 +509,25 @@ class UpdateReportDialog(QDialog):
     import tempfile
 
     def print_pdf(self):
+        # 1. Fetch patient from DB, u pozadini; PDF se pravi kada stigne
+        self.print_btn.setEnabled(False)
+        submit_or_call(
+            self.db_worker,
+            self.db_manager.get_patient, self.patient_id,
+            callback=self.print_patient_pdf,
+            error_callback=self.on_print_failed
+        )
+
+    def print_patient_pdf(self, row):
+        self.print_btn.setEnabled(True)
         try:
-            # 1. Fetch patient from DB
-            row = self.db_manager.get_patient(self.patient_id)
             if not row:
                 raise ValueError("Pacijent nije pronađen u bazi.")
 
             patient = {
-                "full_name": row[1] + " " + row[2],  # name + last_name
-                "birthday": row[7],  # birthday
-                "address": row[8] or ""  # address (nullable)
+                "full_name": row.name + " " + row.last_name,
+                "birthday": row.birthday,
+                "address": row.address or ""  # address (nullable)
             }
 
             # 2. Get diagnosis text from input
@@ -528,3 +552,8 @@ class UpdateReportDialog(QDialog):
         except Exception as e:
             warning = WarningDialog(f"Greška pri generisanju PDF-a: {str(e)}", self)
             warning.exec( )
+
+    def on_print_failed(self, error):
+        self.print_btn.setEnabled(True)
+        warning = WarningDialog(f"Greška pri generisanju PDF-a: {str(error)}", self)
+        warning.exec()
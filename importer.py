@@ -0,0 +1,259 @@
+"""
+Streaming import of patients and visits from CSV or JSON-lines files.
+
+Rows are read one at a time, validated and normalized, then written by DatabaseManager.import_patients
+and import_appointments in batched transactions, so memory use does not depend on the file size.
+Excel files have to be saved as CSV first.
+
+Usage: python importer.py [--db PATH] [--patients FILE] [--visits FILE] [--batch-size N]
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import re
+import time
+
+from utils import load_config
+
+# Nazivi kolona koje prepoznajemo u izvoznim fajlovima drugih programa -> naše ime polja
+PATIENT_FIELD_ALIASES = {
+    "ref": ("ref", "id", "patient_id", "sifra", "šifra", "karton"),
+    "name": ("name", "first_name", "ime"),
+    "last_name": ("last_name", "surname", "prezime"),
+    "full_name": ("full_name", "ime_prezime", "ime i prezime", "pacijent"),
+    "birthday": ("birthday", "birth_date", "datum_rodjenja", "datum rođenja", "datum_rođenja"),
+    "phone_number": ("phone_number", "phone", "telefon"),
+    "email": ("email", "e-mail", "mejl"),
+    "gender": ("gender", "sex", "pol"),
+    "address": ("address", "adresa"),
+    "note": ("note", "notes", "napomena"),
+}
+VISIT_FIELD_ALIASES = {
+    "patient_ref": ("patient_ref", "patient_id", "pacijent_id", "sifra", "šifra", "karton"),
+    "name": ("name", "first_name", "ime"),
+    "last_name": ("last_name", "surname", "prezime"),
+    "full_name": ("full_name", "ime_prezime", "ime i prezime", "pacijent"),
+    "birthday": ("birthday", "birth_date", "datum_rodjenja", "datum rođenja", "datum_rođenja"),
+    "date": ("date", "visit_date", "datum", "datum_pregleda"),
+    "diagnose_text": ("diagnose_text", "diagnosis", "dijagnoza", "izvestaj", "izveštaj", "nalaz"),
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%Y.", "%d/%m/%Y", "%d-%m-%Y")
+DATETIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y. %H:%M")
+
+GENDERS = {
+    "m": "Muško", "male": "Muško", "musko": "Muško", "muško": "Muško", "muski": "Muško", "muški": "Muško",
+    "z": "Žensko", "ž": "Žensko", "f": "Žensko", "female": "Žensko", "zensko": "Žensko", "žensko": "Žensko",
+    "zenski": "Žensko", "ženski": "Žensko",
+}
+
+# Koliko poruka o odbijenim redovima se čuva u rezultatu; ostali se samo broje
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+class RecordReader:
+    """Iterates over the records of a .csv, .jsonl/.ndjson file and counts the bytes read so far."""
+
+    def __init__(self, path):
+        self.path = path
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in (".csv", ".jsonl", ".ndjson"):
+            raise ValueError(f"Unsupported import file type: {extension} (use .csv or .jsonl)")
+        self.is_csv = extension == ".csv"
+
+    def _lines(self, f):
+        for line in f:
+            self.bytes_read += len(line.encode("utf-8"))
+            yield line
+
+    def __iter__(self):
+        """Yields (line_number, record dict) pairs."""
+        # utf-8-sig: Excel na početak CSV fajla upisuje BOM
+        with open(self.path, "r", encoding="utf-8-sig", newline="") as f:
+            if self.is_csv:
+                sample = f.read(4096)
+                f.seek(0)
+                try:
+                    dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+                except csv.Error:
+                    dialect = csv.excel
+                reader = csv.DictReader(self._lines(f), dialect=dialect)
+                for record in reader:
+                    yield reader.line_num, record
+            else:
+                for line_number, line in enumerate(self._lines(f), start=1):
+                    if line.strip():
+                        try:
+                            record = json.loads(line)
+                        except ValueError as e:
+                            yield line_number, ImportRowError(f"invalid JSON: {e}")
+                            continue
+                        yield line_number, record
+
+
+def _pick(record, aliases):
+    # Zaglavlja se porede bez obzira na velika/mala slova i razmake oko imena
+    lowered = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+    result = {}
+    for field, names in aliases.items():
+        for name in names:
+            value = lowered.get(name)
+            if isinstance(value, str):
+                value = " ".join(value.split())
+            if value not in (None, ""):
+                result[field] = value
+                break
+    return result
+
+
+def normalize_date(value, with_time=False):
+    text = str(value).strip()
+    if with_time:
+        for date_format in DATETIME_FORMATS:
+            try:
+                return datetime.datetime.strptime(text, date_format).strftime("%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ImportRowError(f"unrecognized date: {text!r}")
+
+
+def _split_name(fields):
+    if "name" not in fields or "last_name" not in fields:
+        full_name = fields.get("full_name")
+        if not full_name:
+            raise ImportRowError("missing name")
+        parts = full_name.split(" ", 1)
+        fields["name"] = parts[0]
+        fields["last_name"] = parts[1] if len(parts) > 1 else ""
+    fields.pop("full_name", None)
+
+
+def normalize_patient(record):
+    """Maps one input record to add_patient's fields. Raises ImportRowError for unusable rows."""
+    fields = _pick(record, PATIENT_FIELD_ALIASES)
+    _split_name(fields)
+    if "birthday" not in fields:
+        raise ImportRowError("missing birthday")
+    fields["birthday"] = normalize_date(fields["birthday"])
+    if "phone_number" in fields:
+        phone = str(fields["phone_number"])
+        fields["phone_number"] = ("+" if phone.startswith("+") else "") + re.sub(r"\D", "", phone)
+    if "email" in fields:
+        email = str(fields["email"]).lower()
+        if "@" not in email:
+            raise ImportRowError(f"invalid email: {email!r}")
+        fields["email"] = email
+    if "gender" in fields:
+        fields["gender"] = GENDERS.get(str(fields["gender"]).lower(), "Drugo")
+    return fields
+
+
+def normalize_visit(record):
+    """Maps one input record to import_appointments' fields. Raises ImportRowError for unusable rows."""
+    fields = _pick(record, VISIT_FIELD_ALIASES)
+    if "date" not in fields:
+        raise ImportRowError("missing visit date")
+    fields["date"] = normalize_date(fields["date"], with_time=True)
+    if "patient_ref" not in fields:
+        _split_name(fields)
+        if "birthday" not in fields:
+            raise ImportRowError("visit has neither patient_ref nor patient name and birthday")
+        fields["birthday"] = normalize_date(fields["birthday"])
+    return fields
+
+
+def _valid_rows(reader, normalize, summary):
+    for line_number, record in reader:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ImportRowError("record is not an object")
+            yield normalize(record)
+        except ImportRowError as e:
+            summary["rejected"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append(f"{os.path.basename(reader.path)}:{line_number}: {e}")
+
+
+def run_import(db_manager, patients_path=None, visits_path=None, batch_size=1000, progress_callback=None):
+    """
+    Imports patients first, then visits. progress_callback(phase, bytes_read, total_bytes, stats) runs
+    after every batch, phase being "patients" or "visits". Call it from one thread for the whole run.
+    Returns a summary dict with per-phase stats, rejected row count, sample errors and throughput.
+    """
+    summary = {"patients": None, "visits": None, "rejected": 0, "errors": []}
+    start = time.perf_counter()
+    rows = 0
+    for phase, path, normalize, write in (
+        ("patients", patients_path, normalize_patient, db_manager.import_patients),
+        ("visits", visits_path, normalize_visit, db_manager.import_appointments),
+    ):
+        if not path:
+            continue
+        reader = RecordReader(path)
+
+        def report(stats, phase=phase, reader=reader):
+            if progress_callback:
+                progress_callback(phase, reader.bytes_read, reader.total_bytes, stats)
+
+        stats = write(_valid_rows(reader, normalize, summary), batch_size=batch_size, progress_callback=report)
+        summary[phase] = stats
+        if stats is None:
+            break  # greška je već zapisana u log
+        rows += stats["read"]
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = elapsed
+    summary["rows_per_second"] = rows / elapsed if elapsed > 0 else float(rows)
+    return summary
+
+
+def main():
+    # Isti podrazumevani put kao u main.py
+    default_db = os.path.join(os.path.expandvars(r"%APPDATA%\DoctorApp"), "data", "database.db")
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=default_db)
+    parser.add_argument("--patients", help="CSV or JSON-lines file with patients")
+    parser.add_argument("--visits", help="CSV or JSON-lines file with visits")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    if not args.patients and not args.visits:
+        parser.error("nothing to import: pass --patients and/or --visits")
+
+    from database_manager import DatabaseManager
+    db_manager = DatabaseManager(args.db, load_config().get("database"))
+    db_manager.run_schema_tasks()
+
+    def progress(phase, bytes_read, total_bytes, stats):
+        percent = 100 * bytes_read / total_bytes if total_bytes else 100
+        print(f"\r{phase}: {percent:5.1f}%  {stats}", end="", flush=True)
+
+    try:
+        summary = run_import(db_manager, args.patients, args.visits, args.batch_size, progress)
+    finally:
+        db_manager.close()
+    print()
+    for phase in ("patients", "visits"):
+        if summary[phase] is not None:
+            print(f"{phase}: {summary[phase]}")
+    print(f"rejected rows: {summary['rejected']}")
+    for error in summary["errors"]:
+        print(f"  {error}")
+    print(f"{summary['seconds']:.1f} s, {summary['rows_per_second']:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import sys
 import os
 from PyQt6.QtWidgets import QApplication
 from database_manager import DatabaseManager
+from utils import load_config
 from gui.main_window import MainWindow
 
 def resource_path(relative_path):
@@ -18,15 +19,21 @@ def main():
     os.makedirs(app_data_dir, exist_ok=True)
     db_path = os.path.join(app_data_dir, "database.db")
 
+    config = load_config()
+
     # Initialize database
-    db_manager = DatabaseManager(db_path)
+    db_manager = DatabaseManager(db_path, config.get("database"))
     print("Database initialized successfully.")
 
     app = QApplication(sys.argv)
 
     window = MainWindow(db_manager)
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+
+    # Zatvori sve konekcije ka bazi pre izlaska
+    db_manager.close()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Compact row records returned by DatabaseManager.
+
+Each query selects only the columns its caller shows; fields that were not selected stay None.
+The classes use __slots__, so a record has no per-instance __dict__ and stays small when many
+of them are kept in lists or caches.
+"""
+
+# Kolone koje se biraju za pojedine prikaze
+PATIENT_COLUMNS = "id, name, last_name, full_name, phone_number, email, gender, birthday, address, note"
+PATIENT_LIST_COLUMNS = "id, full_name, birthday"
+APPOINTMENT_COLUMNS = "id, id_patient, date, diagnose_text, diagnose_sound"
+APPOINTMENT_LIST_COLUMNS = "id, date, diagnose_text"
+
+
+class Record:
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"Unknown {type(self).__name__} fields: {', '.join(fields)}")
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """sqlite3 row_factory: column names of the query become attribute names."""
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, None)
+        for column, value in zip(cursor.description, row):
+            setattr(record, column[0], value)
+        return record
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__ if getattr(self, name) is not None
+        )
+        return f"{type(self).__name__}({fields})"
+
+
+class Patient(Record):
+    __slots__ = ("id", "name", "last_name", "full_name", "phone_number", "email", "gender", "birthday",
+                 "address", "note")
+
+    @property
+    def birth_year(self):
+        return str(self.birthday).split("-")[0] if self.birthday else "N/A"
+
+
+class Appointment(Record):
+    __slots__ = ("id", "id_patient", "date", "diagnose_text", "diagnose_sound")
@@ -0,0 +1,229 @@
+"""
+In-memory trigram index over patient names, for lookups that tolerate typos ("Jovnović" -> "Jovanović").
+
+Names are indexed in their fold_text form, word by word: every distinct word gets an id, the trigram
+postings point to word ids and every word keeps the ids of the patients whose name contains it. Common
+words ("marko", "jovanovic") are stored once no matter how many patients share them, so the index stays
+small and a query only counts trigram hits over the vocabulary, not over all patients.
+"""
+import heapq
+import math
+import sys
+import threading
+from array import array
+from collections import Counter, OrderedDict
+
+# Najmanja sličnost (Jaccard nad trigramima) da bi se reč iz upita smatrala pogotkom reči iz imena
+MIN_WORD_SIMILARITY = 0.4
+
+# Koliko najsličnijih reči iz rečnika se uzima po reči upita
+MAX_WORD_MATCHES = 64
+
+# Koliko reči upita pamti keš sličnih reči; pri kucanju se prve reči upita ponavljaju iz poziva u poziv
+WORD_CACHE_SIZE = 256
+
+
+def word_trigrams(word):
+    """Trigrams of one folded word, padded like pg_trgm: "ana" -> {"  a", " an", "ana", "na "}."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Thread-safe; every public method takes the lock, so readers never see a half-applied update."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loaded = False
+        self._generation = 0
+        self._pending = None  # izmene pristigle dok load() čita bazu
+        self._reset()
+
+    def _reset(self):
+        self._word_ids = {}  # reč -> id reči
+        self._words = []  # id reči -> reč
+        self._word_sizes = array("H")  # id reči -> broj trigrama
+        self._word_patients = []  # id reči -> array id-jeva pacijenata
+        self._trigrams = {}  # trigram -> array id-jeva reči
+        self._patient_words = {}  # id pacijenta -> tuple id-jeva reči
+        self._word_cache = OrderedDict()  # (reč upita, prag, veličina rečnika) -> [(id reči, sličnost)]
+
+    def _word_id(self, word):
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            word_id = len(self._word_sizes)
+            self._word_ids[word] = word_id
+            self._words.append(word)
+            trigrams = word_trigrams(word)
+            self._word_sizes.append(len(trigrams))
+            self._word_patients.append(array("i"))
+            for trigram in trigrams:
+                postings = self._trigrams.get(trigram)
+                if postings is None:
+                    postings = self._trigrams[trigram] = array("i")
+                postings.append(word_id)
+        return word_id
+
+    def _add(self, patient_id, folded_name):
+        self._remove(patient_id)
+        word_ids = tuple(dict.fromkeys(self._word_id(word) for word in (folded_name or "").split()))
+        if word_ids:
+            self._patient_words[patient_id] = word_ids
+            for word_id in word_ids:
+                self._word_patients[word_id].append(patient_id)
+
+    def _remove(self, patient_id):
+        # Reč bez pacijenata ostaje u rečniku; samo ne donosi rezultate
+        for word_id in self._patient_words.pop(patient_id, ()):
+            self._word_patients[word_id].remove(patient_id)
+
+    def add(self, patient_id, folded_name):
+        """Indexes (or re-indexes) one patient under its fold_text(full_name)."""
+        with self._lock:
+            self._add(patient_id, folded_name)
+            if self._pending is not None:
+                self._pending.append((patient_id, folded_name))
+
+    def remove(self, patient_id):
+        self.add(patient_id, None)
+
+    def load(self, rows):
+        """
+        Replaces the whole index with (patient_id, folded_name) rows and marks it loaded. `rows` is consumed
+        after the load starts, so pass a lazy iterator; add()/remove() calls made meanwhile are replayed.
+        """
+        with self._lock:
+            self._pending = []
+            generation = self._generation
+        rebuilt = TrigramIndex()
+        complete = False
+        try:
+            for patient_id, folded_name in rows:
+                rebuilt._add(patient_id, folded_name)
+            complete = True
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if complete:
+                    for patient_id, folded_name in pending:
+                        rebuilt._add(patient_id, folded_name)
+                    for name in ("_word_ids", "_words", "_word_sizes", "_word_patients", "_trigrams",
+                                 "_patient_words", "_word_cache"):
+                        setattr(self, name, getattr(rebuilt, name))
+                    # Ako je masovni upis u međuvremenu poništio indeks, učitani redovi su možda nepotpuni
+                    self.loaded = generation == self._generation
+
+    def invalidate(self):
+        """Marks the index stale, e.g. after a bulk write that bypassed add()."""
+        with self._lock:
+            self._generation += 1
+            self.loaded = False
+
+    def _similar_words(self, word, min_similarity):
+        # Reči se iz rečnika ne brišu, pa je pogodak iz keša tačan dok god rečnik nije narastao
+        key = (word, min_similarity, len(self._words))
+        words = self._word_cache.get(key)
+        if words is None:
+            words = self._word_cache[key] = self._find_similar_words(word, min_similarity)
+            if len(self._word_cache) > WORD_CACHE_SIZE:
+                self._word_cache.popitem(last=False)
+        else:
+            self._word_cache.move_to_end(key)
+        # Reč čiji su pacijenti u međuvremenu obrisani ili preimenovani više ne donosi rezultate
+        matches = {word_id: similarity for word_id, similarity in words if self._word_patients[word_id]}
+        if len(matches) > MAX_WORD_MATCHES:
+            matches = dict(heapq.nlargest(MAX_WORD_MATCHES, matches.items(), key=lambda item: item[1]))
+        return matches
+
+    def _find_similar_words(self, word, min_similarity):
+        """(word id, similarity) of every vocabulary word at least min_similarity similar to `word`."""
+        trigrams = word_trigrams(word)
+        size = len(trigrams)
+        # Reč sa sličnošću >= t deli bar ceil(t * size) trigrama sa upitom, pa mora da sadrži bar jedan od
+        # najređih trigrama upita (prefiks filter); česti trigrami ("ic ", "vic") se samo proveravaju na kandidatima
+        known = sorted((len(self._trigrams[trigram]), trigram) for trigram in trigrams if trigram in self._trigrams)
+        probe_count = len(known) - math.ceil(min_similarity * size - 1e-9) + 1
+        if probe_count <= 0:
+            return []
+        counts = Counter()
+        for _, trigram in known[:probe_count]:
+            counts.update(self._trigrams[trigram])
+        rest = {trigram for _, trigram in known[probe_count:]}
+        # Zajedničkih trigrama ima najviše shared + len(rest), a sličnost >= t traži
+        # (1 + t) * zajednički >= t * (size + other_size)
+        factor = min_similarity / (1 + min_similarity)
+        sizes = self._word_sizes
+        matches = []
+        for word_id, shared in counts.items():
+            other_size = sizes[word_id]
+            if shared + len(rest) < factor * (size + other_size) - 1e-9:
+                continue
+            if rest:
+                shared += len(rest.intersection(word_trigrams(self._words[word_id])))
+            similarity = shared / (size + other_size - shared)
+            if similarity >= min_similarity:
+                matches.append((word_id, similarity))
+        return matches
+
+    def search(self, folded_query, limit=20, min_similarity=MIN_WORD_SIMILARITY):
+        """
+        Returns up to `limit` (patient_id, score) pairs, best first. Every word of the query has to be
+        similar to some word of the patient's name; score is the mean of those similarities (1.0 = exact).
+        """
+        words = list(dict.fromkeys((folded_query or "").split()))
+        if not words or limit <= 0:
+            return []
+        with self._lock:
+            word_matches = [self._similar_words(word, min_similarity) for word in words]
+            if not all(word_matches):
+                return []
+            if len(word_matches) == 1:
+                return self._top_patients(word_matches[0], limit)
+            # Pacijenti koji imaju pogodak za svaku reč upita; skupovi se seku od najmanjeg
+            candidates = None
+            for matches in sorted(word_matches, key=lambda m: sum(len(self._word_patients[w]) for w in m)):
+                patients = set()
+                for word_id in matches:
+                    patients.update(self._word_patients[word_id])
+                candidates = patients if candidates is None else candidates.intersection(patients)
+                if not candidates:
+                    return []
+            scored = []
+            for patient_id in candidates:
+                patient_words = self._patient_words[patient_id]
+                total = sum(max(matches.get(w, 0.0) for w in patient_words) for matches in word_matches)
+                scored.append((total / len(words), -patient_id))
+        return [(-negative_id, score) for score, negative_id in heapq.nlargest(limit, scored)]
+
+    def _top_patients(self, matches, limit):
+        results = []
+        seen = set()
+        # Reči idu od najsličnije, pa je prvi susret s pacijentom ujedno i njegov najbolji rezultat
+        for word_id, similarity in sorted(matches.items(), key=lambda item: (-item[1], item[0])):
+            for patient_id in self._word_patients[word_id]:
+                if patient_id not in seen:
+                    seen.add(patient_id)
+                    results.append((patient_id, similarity))
+                    if len(results) == limit:
+                        return results
+        return results
+
+    def stats(self):
+        """Sizes of the index and an estimate of the memory it holds, in bytes."""
+        with self._lock:
+            memory = (sys.getsizeof(self._word_ids) + sys.getsizeof(self._word_sizes) +
+                      sys.getsizeof(self._word_patients) + sys.getsizeof(self._trigrams) +
+                      sys.getsizeof(self._patient_words))
+            memory += sys.getsizeof(self._words) + sum(sys.getsizeof(word) for word in self._word_ids)
+            memory += sum(sys.getsizeof(patients) for patients in self._word_patients)
+            memory += sum(sys.getsizeof(trigram) + sys.getsizeof(postings)
+                          for trigram, postings in self._trigrams.items())
+            memory += sum(sys.getsizeof(patient_id) + sys.getsizeof(word_ids)
+                          for patient_id, word_ids in self._patient_words.items())
+            return {
+                "loaded": self.loaded,
+                "patients": len(self._patient_words),
+                "words": len(self._word_ids),
+                "trigrams": len(self._trigrams),
+                "memory_bytes": memory,
+            }
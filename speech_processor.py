@@ -10,6 +10,7 @@ import datetime
 from PyQt6.QtCore import pyqtSignal, QObject
 import torchaudio
 import logging
+from text_utils import cyrillic_to_latin
 
 # Ensure audio directory exists before logging setup
 def get_audio_dir(base_dir):
@@ -31,21 +32,6 @@ if getattr(sys, 'frozen', False):
     os.environ["PATH"] += os.pathsep + sys._MEIPASS
     torchaudio.set_audio_backend("ffmpeg")
 
-# Serbian Cyrillic to Latin mapping
-CYRILLIC_TO_LATIN = {
-    'А': 'A', 'а': 'a', 'Б': 'B', 'б': 'b', 'В': 'V', 'в': 'v', 'Г': 'G', 'г': 'g',
-    'Д': 'D', 'д': 'd', 'Ђ': 'Đ', 'ђ': 'đ', 'Е': 'E', 'е': 'e', 'Ж': 'Ž', 'ж': 'ž',
-    'З': 'Z', 'з': 'z', 'И': 'I', 'и': 'i', 'Ј': 'J', 'ј': 'j', 'К': 'K', 'к': 'k',
-    'Л': 'L', 'л': 'l', 'Љ': 'Lj', 'љ': 'lj', 'М': 'M', 'м': 'm', 'Н': 'N', 'н': 'n',
-    'Њ': 'Nj', 'њ': 'nj', 'О': 'O', 'о': 'o', 'П': 'P', 'п': 'p', 'Р': 'R', 'р': 'r',
-    'С': 'S', 'с': 's', 'Т': 'T', 'т': 't', 'Ћ': 'Ć', 'ћ': 'ć', 'У': 'U', 'у': 'u',
-    'Ф': 'F', 'ф': 'f', 'Х': 'H', 'х': 'h', 'Ц': 'C', 'ц': 'c', 'Ч': 'Č', 'ч': 'č',
-    'Џ': 'Dž', 'џ': 'dž', 'Ш': 'Š', 'ш': 'š'
-}
-
-def cyrillic_to_latin(text):
-    return ''.join(CYRILLIC_TO_LATIN.get(char, char) for char in text)
-
 def resource_path(relative_path):
     base_path = sys._MEIPASS if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
@@ -0,0 +1,108 @@
+import unicodedata
+
+# Serbian Cyrillic to Latin mapping
+CYRILLIC_TO_LATIN = {
+    'А': 'A', 'а': 'a', 'Б': 'B', 'б': 'b', 'В': 'V', 'в': 'v', 'Г': 'G', 'г': 'g',
+    'Д': 'D', 'д': 'd', 'Ђ': 'Đ', 'ђ': 'đ', 'Е': 'E', 'е': 'e', 'Ж': 'Ž', 'ж': 'ž',
+    'З': 'Z', 'з': 'z', 'И': 'I', 'и': 'i', 'Ј': 'J', 'ј': 'j', 'К': 'K', 'к': 'k',
+    'Л': 'L', 'л': 'l', 'Љ': 'Lj', 'љ': 'lj', 'М': 'M', 'м': 'm', 'Н': 'N', 'н': 'n',
+    'Њ': 'Nj', 'њ': 'nj', 'О': 'O', 'о': 'o', 'П': 'P', 'п': 'p', 'Р': 'R', 'р': 'r',
+    'С': 'S', 'с': 's', 'Т': 'T', 'т': 't', 'Ћ': 'Ć', 'ћ': 'ć', 'У': 'U', 'у': 'u',
+    'Ф': 'F', 'ф': 'f', 'Х': 'H', 'х': 'h', 'Ц': 'C', 'ц': 'c', 'Ч': 'Č', 'ч': 'č',
+    'Џ': 'Dž', 'џ': 'dž', 'Ш': 'Š', 'ш': 'š'
+}
+
+_CYRILLIC_TABLE = str.maketrans(CYRILLIC_TO_LATIN)
+
+# Đ se ne rastavlja kroz NFKD, pa se posebno svodi na d
+_FOLD_TABLE = str.maketrans({'Đ': 'd', 'đ': 'd'})
+
+
+def cyrillic_to_latin(text):
+    return text.translate(_CYRILLIC_TABLE)
+
+
+def fold_text(text):
+    """
+    Search form of a text: Cyrillic is transliterated to Latin, diacritics are removed, the result is
+    lowercased and whitespace is collapsed. "Павловић", "Pavlović" and "PAVLOVIC" all become "pavlovic";
+    "Ђорђе", "Đorđe" and "Djordje" all become "dorde".
+    Registered in SQLite as the deterministic fold_text() function, so it must never change behavior
+    without a migration that recomputes patient.search_key.
+    """
+    if text is None:
+        return None
+    text = unicodedata.normalize("NFKD", cyrillic_to_latin(str(text)).translate(_FOLD_TABLE))
+    folded = " ".join("".join(c for c in text if not unicodedata.combining(c)).lower().split())
+    # Bez naših slova đ se kuca i kao "dj"; oba oblika se svode na isto
+    return folded.replace("dj", "d")
+
+
+# Zamene za phonetic_key, redom; rade nad fold_text oblikom, gde su đ/dj već "d", a č/ć "c"
+_PHONETIC_REPLACEMENTS = (
+    ("tch", "c"), ("ch", "c"), ("sh", "s"), ("zh", "z"), ("dz", "d"), ("ph", "f"), ("th", "t"), ("ck", "k"),
+    ("x", "ks"), ("w", "v"), ("q", "k"), ("y", "j"), ("lj", "l"), ("nj", "n"), ("h", ""),
+)
+_PHONETIC_VOWELS = "aeiou"
+
+
+def phonetic_key(text):
+    """
+    Sound-alike form of a name, for spellings typed by ear. On top of fold_text: English-style digraphs
+    (ch, sh, zh, tch) map to c, s, z; dž, đ and dj all become d; lj and nj lose the j; h is dropped;
+    j next to i, or between a vowel and a consonant, is dropped or read as i; doubled letters collapse.
+    "Đorđević", "Djordjevich" and "Dzordzevic" all become "dordevic"; "Mihajlo" and "Mijailo" become
+    "miailo". Registered in SQLite like fold_text, so changing it needs a migration that rebuilds
+    idx_patient_phonetic_key.
+    """
+    folded = fold_text(text)
+    if folded is None:
+        return None
+    words = []
+    for word in folded.split():
+        for old, new in _PHONETIC_REPLACEMENTS:
+            word = word.replace(old, new)
+        letters = []
+        for i, c in enumerate(word):
+            if c == "j":
+                previous = word[i - 1] if i else ""
+                following = word[i + 1] if i + 1 < len(word) else ""
+                if previous == "i" or following == "i":
+                    continue  # Marija / Maria, Ilija / Ilia
+                if previous and previous in _PHONETIC_VOWELS and following not in _PHONETIC_VOWELS:
+                    c = "i"  # Mihajlo / Mihailo
+            if not letters or letters[-1] != c:
+                letters.append(c)
+        words.append("".join(letters))
+    return " ".join(words)
+
+
+def phone_key(text):
+    """
+    Search form of a phone number: digits only, with the +381 / 00381 country code turned into the
+    leading 0 used inside Serbia. "+381 63/123-45-67", "00381631234567" and "063 123 4567" all become
+    "0631234567". Registered in SQLite like fold_text, so changing it needs a migration that rebuilds
+    idx_patient_phone_key.
+    """
+    if text is None:
+        return None
+    digits = "".join(c for c in str(text) if c.isdigit())
+    if not digits:
+        return None
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif not str(text).lstrip().startswith("+"):
+        return digits
+    # Međunarodni oblik: naš pozivni broj postaje 0, ostali ostaju bez "+"/"00"
+    return "0" + digits[3:] if digits.startswith("381") else digits
+
+
+def register_sql_functions(conn):
+    """
+    Registers the functions that generated columns of the database are computed with on `conn`. Every
+    connection that opens the database file (DatabaseManager, backups, restore) needs them; without them
+    SQLite cannot read those columns and even PRAGMA quick_check fails with "unknown function".
+    """
+    conn.create_function("fold_text", 1, fold_text, deterministic=True)
+    conn.create_function("phonetic_key", 1, phonetic_key, deterministic=True)
+    conn.create_function("phone_key", 1, phone_key, deterministic=True)
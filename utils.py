@@ -1,5 +1,6 @@
 import json
 import os
+import sys
 import datetime
 
 def log_error(message):
@@ -15,4 +16,17 @@ def log_error(message):
             json.dump(log_entry, f, ensure_ascii=False)
             f.write("\n")
     except Exception:
-        pass
\ No newline at end of file
+        pass
+
+def load_config():
+    """Reads config.json from the app directory. Returns an empty dict if it is missing or invalid."""
+    base_dir = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    config_path = os.path.join(base_dir, "config.json")
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log_error(f"Loading config failed: {e}")
+        return {}